@@ -0,0 +1,143 @@
+"""
+    mdb2csv - Exports tables from mdb file to csv file
+    Copyright (C) 2024  Aléxis Rodrigues de Almeida
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+from decimal import Decimal
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+from consts import (MDB_BOOL, MDB_BYTE, MDB_INT, MDB_LONGINT, MDB_COMPLEX, MDB_FLOAT, MDB_DOUBLE, MDB_DATETIME,
+                    MDB_MONEY, MDB_TEXT, MDB_MEMO, MDB_NUMERIC, MDB_REPID)
+from utils import ole_to_datetime, ole_to_datetime64, ole_invalid_mask
+
+
+def require_pyarrow():
+    if pa is None:
+        raise ImportError("pyarrow is required for Arrow and Parquet export")
+
+
+def arrow_type(col, dictionary=True):
+    """
+     * Arrow type of a column. MDB_TEXT columns are dictionary encoded with
+     * 'dictionary'. MDB_OLE columns map to binary but hold only nulls, as
+     * batches don't load long binary values (see BlobExporter).
+    """
+    col_type = col.col_type
+
+    if col_type == MDB_BOOL:
+        return pa.bool_()
+    elif col_type == MDB_BYTE:
+        return pa.uint8()
+    elif col_type == MDB_INT:
+        return pa.int16()
+    elif col_type in (MDB_LONGINT, MDB_COMPLEX):
+        return pa.int32()
+    elif col_type == MDB_FLOAT:
+        return pa.float32()
+    elif col_type == MDB_DOUBLE:
+        return pa.float64()
+    elif col_type == MDB_DATETIME:
+        return pa.timestamp("s")
+    elif col_type == MDB_MONEY:
+        return pa.decimal128(19, 4)
+    elif col_type == MDB_NUMERIC:
+        return pa.decimal128(max(col.col_prec, col.col_scale, 1), col.col_scale)
+    elif col_type == MDB_TEXT:
+        return pa.dictionary(pa.int32(), pa.string()) if dictionary else pa.string()
+    elif col_type in (MDB_MEMO, MDB_REPID):
+        return pa.string()
+
+    return pa.binary()
+
+
+def arrow_schema(columns, dictionary=True):
+    return pa.schema([pa.field(col.name, arrow_type(col, dictionary)) for col in columns])
+
+
+def arrow_array(bcol, field_type):
+    # Arrow array of a finished BatchColumn
+    col_type = bcol.col_type
+    gathered = not isinstance(bcol.values, list) and not bcol.is_text()
+
+    if col_type == MDB_DATETIME:
+        if gathered:
+            # dates ole_to_datetime can't convert are nulls, as on the row path
+            nulls = bcol.nulls | ole_invalid_mask(np.where(bcol.nulls, 0.0, bcol.values))
+            values = ole_to_datetime64(np.where(nulls, 0.0, bcol.values))
+            return pa.array(values, type=field_type, mask=nulls)
+        return pa.array([None if is_null else ole_to_datetime(value)
+                         for is_null, value in zip(bcol.nulls, bcol.values)], type=field_type)
+    elif col_type in (MDB_MONEY, MDB_NUMERIC):
+        scale = field_type.scale
+        values = bcol.values.tolist() if gathered else bcol.values
+        return pa.array([None if is_null else Decimal(value).scaleb(-scale)
+                         for is_null, value in zip(bcol.nulls, values)], type=field_type)
+    elif gathered:
+        return pa.array(bcol.values, type=field_type, mask=bcol.nulls)
+    elif pa.types.is_dictionary(field_type):
+        return pa.array(bcol.to_list(), type=field_type.value_type).dictionary_encode()
+
+    return pa.array(bcol.to_list(), type=field_type)
+
+
+def to_record_batch(batch, schema):
+    # Arrow RecordBatch of a finished batch.Batch, built column by column
+    arrays = [arrow_array(bcol, field.type) for bcol, field in zip(batch.columns, schema)]
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def write_parquet(path, schema, record_batches, row_group_size=1024 * 1024, **options):
+    """
+     * Writes record_batches to a Parquet file in row groups of row_group_size
+     * rows, holding at most one row group plus one batch in memory. options
+     * are passed to pyarrow.parquet.ParquetWriter (compression, ...).
+     * Returns the number of rows written.
+    """
+    rows = 0
+    pending = []
+    pending_rows = 0
+
+    with pq.ParquetWriter(path, schema, **options) as writer:
+        for record_batch in record_batches:
+            pending.append(record_batch)
+            pending_rows += record_batch.num_rows
+            if pending_rows < row_group_size:
+                continue
+
+            table = pa.Table.from_batches(pending, schema)
+            full = pending_rows - pending_rows % row_group_size
+            writer.write_table(table.slice(0, full), row_group_size=row_group_size)
+            rows += full
+            rest = table.slice(full)
+            pending = rest.to_batches()
+            pending_rows = rest.num_rows
+
+        if pending_rows:
+            writer.write_table(pa.Table.from_batches(pending, schema), row_group_size=row_group_size)
+            rows += pending_rows
+
+    return rows
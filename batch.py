@@ -0,0 +1,353 @@
+"""
+    mdb2csv - Exports tables from mdb file to csv file
+    Copyright (C) 2024  Aléxis Rodrigues de Almeida
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from consts import (MDB_BOOL, MDB_BYTE, MDB_INT, MDB_LONGINT, MDB_COMPLEX, MDB_FLOAT, MDB_DOUBLE, MDB_DATETIME,
+                    MDB_MONEY, MDB_TEXT, MDB_MEMO, MDB_OLE, MDB_NUMERIC, MDB_REPID)
+from lval import LvalResolver
+from utils import SINT16, SINT32, SINT64, SINGLE, DOUBLE, ole_to_datetime, ole_to_datetime64, numeric_to_int, \
+    uuid_to_string, money_ints_to_strings, numeric_ints_to_strings
+
+TEXT_TYPES = (MDB_TEXT, MDB_MEMO)
+
+# NumPy dtypes of the fixed width columns that can be gathered a page at a time
+NUMPY_DTYPES = {
+    MDB_BYTE: "<u1",
+    MDB_INT: "<i2",
+    MDB_LONGINT: "<i4",
+    MDB_COMPLEX: "<i4",
+    MDB_FLOAT: "<f4",
+    MDB_DOUBLE: "<f8",
+    MDB_DATETIME: "<f8",
+    MDB_MONEY: "<i8",
+}
+
+
+def value_reader(col):
+    """
+     * Returns a function (buf, start, size) -> value decoding one non null
+     * value of the column:
+     *   MDB_BYTE, MDB_INT, MDB_LONGINT: int
+     *   MDB_FLOAT, MDB_DOUBLE: float
+     *   MDB_DATETIME: float, days since 1899-12-30 (OLE automation date)
+     *   MDB_MONEY: int, the amount scaled by 10000
+     *   MDB_NUMERIC: int, the unscaled value (divide by 10 ** col_scale)
+     *   MDB_REPID: str, the GUID in the mdb's repid_fmt
+     *   MDB_TEXT, MDB_MEMO: str
+     *   MDB_OLE: None (long binary values are not loaded in memory)
+     *   others: bytes
+    """
+    col_type = col.col_type
+
+    if col_type == MDB_BYTE:
+        return lambda buf, start, size: buf[start]
+    elif col_type == MDB_INT:
+        unpack = SINT16.unpack_from
+    elif col_type in (MDB_LONGINT, MDB_COMPLEX):
+        unpack = SINT32.unpack_from
+    elif col_type == MDB_FLOAT:
+        unpack = SINGLE.unpack_from
+    elif col_type in (MDB_DOUBLE, MDB_DATETIME):
+        unpack = DOUBLE.unpack_from
+    elif col_type == MDB_MONEY:
+        unpack = SINT64.unpack_from
+    elif col_type == MDB_TEXT:
+        return lambda buf, start, size: col.decode_text(buf[start: start + size])
+    elif col_type == MDB_MEMO:
+        # resolved by the batch's LvalResolver, see Batch.append_row
+        return None
+    elif col_type == MDB_NUMERIC:
+        return lambda buf, start, size: numeric_to_int(buf, start)
+    elif col_type == MDB_REPID:
+        fmt = col.mdb.repid_fmt
+        return lambda buf, start, size: uuid_to_string(buf, start, fmt)
+    elif col_type == MDB_OLE:
+        return lambda buf, start, size: None
+    else:
+        return lambda buf, start, size: bytes(buf[start: start + size])
+
+    return lambda buf, start, size: unpack(buf, start)[0]
+
+
+class BatchColumn:
+    """
+     * Values of one column for the rows of a Batch.
+     * Text columns (MDB_TEXT, MDB_MEMO) are kept as one string plus an array
+     * of offsets (value i is data[offsets[i]:offsets[i + 1]]); other columns
+     * keep a list of values. nulls[i] is 1 when value i is null.
+     *
+     * Gathered columns (Batch with use_numpy) keep values and nulls as NumPy
+     * arrays instead; null entries of values are undefined.
+    """
+    __slots__ = ("column", "name", "col_type", "values", "nulls", "offsets", "data", "parts")
+
+    def __init__(self, column):
+        self.column = column
+        self.name = column.name
+        self.col_type = column.col_type
+        self.nulls = bytearray()
+        if self.col_type in TEXT_TYPES:
+            self.values = None
+            self.offsets = array("I", [0])
+            self.parts = []  # per row: str, None, or the LvalResolver key of a memo
+        else:
+            self.values = []
+            self.offsets = None
+            self.parts = None
+        self.data = None
+
+    def is_text(self):
+        return self.offsets is not None
+
+    def vectorize(self):
+        self.values = None
+        self.nulls = None
+        self.parts = []
+
+    def finish(self, lvals=None):
+        if self.parts is None:
+            return
+
+        if self.offsets is not None:
+            f = self.column.mdb.f
+            pieces = []
+            pos = 0
+            for value in self.parts:
+                if isinstance(value, int):
+                    value = f.unicode2ascii(lvals[value])
+                if value:
+                    pieces.append(value)
+                    pos += len(value)
+                self.offsets.append(pos)
+            self.data = "".join(pieces)
+        elif self.parts:
+            self.values = np.concatenate([values for values, nulls in self.parts])
+            self.nulls = np.concatenate([nulls for values, nulls in self.parts])
+        else:
+            self.values = np.zeros(0, NUMPY_DTYPES.get(self.col_type, "?"))
+            self.nulls = np.zeros(0, bool)
+        self.parts = None
+
+    def __len__(self):
+        return len(self.nulls)
+
+    def __getitem__(self, i):
+        if self.nulls[i]:
+            return None
+        if self.offsets is not None:
+            return self.data[self.offsets[i]: self.offsets[i + 1]]
+        return self.values[i]
+
+    def to_list(self):
+        return [self[i] for i in range(len(self.nulls))]
+
+    def to_strings(self):
+        """
+         * Values of MDB_MONEY and MDB_NUMERIC columns as decimal strings (None
+         * for nulls), built from the scaled integers without Decimal objects.
+        """
+        # null entries are None (or undefined when gathered): format 0 in their place
+        values = [0 if is_null else value for is_null, value in zip(self.nulls, self.values)]
+        if self.col_type == MDB_MONEY:
+            texts = money_ints_to_strings(values)
+        elif self.col_type == MDB_NUMERIC:
+            texts = numeric_ints_to_strings(values, self.column.col_scale)
+        else:
+            texts = [str(value) for value in self.values]
+
+        return [None if is_null else text for is_null, text in zip(self.nulls, texts)]
+
+    def to_datetime(self):
+        """
+         * Values of an MDB_DATETIME column as datetime objects (None for nulls),
+         * or as a datetime64 array for gathered columns (check nulls separately).
+        """
+        if isinstance(self.values, list):
+            return [None if is_null else ole_to_datetime(value) for is_null, value in zip(self.nulls, self.values)]
+
+        return ole_to_datetime64(self.values)
+
+
+class Batch:
+    """
+     * Rows of one or more data pages decoded column by column.
+    """
+    __slots__ = ("columns", "num_rows", "pages", "readers", "decoder", "row_columns", "vector_columns",
+                 "fixed_ranks", "lvals")
+
+    def __init__(self, columns, decoder, use_numpy=False):
+        if use_numpy and np is None:
+            raise ImportError("numpy is required for use_numpy")
+
+        self.columns = [BatchColumn(col) for col in columns]
+        self.readers = [value_reader(col) for col in columns]
+        self.decoder = decoder
+        self.lvals = LvalResolver(decoder.table.mdb.f)  # memo values, fetched once the batch is complete
+        self.num_rows = 0
+        self.pages = 0
+        self.row_columns = []     # columns decoded row by row
+        self.vector_columns = []  # columns gathered a page at a time
+        self.fixed_ranks = []     # position of each column among the fixed columns
+
+        rank = 0
+        for i, col in enumerate(columns):
+            self.fixed_ranks.append(rank)
+            if col.is_fixed:
+                rank += 1
+
+            if use_numpy and col.is_fixed and (col.col_type == MDB_BOOL or
+                                               (col.col_type in NUMPY_DTYPES and
+                                                np.dtype(NUMPY_DTYPES[col.col_type]).itemsize == col.col_size)):
+                self.columns[i].vectorize()
+                self.vector_columns.append(i)
+            else:
+                self.row_columns.append(i)
+
+    def append_row(self, buf, decoder):
+        # Appends the row last cracked by the table's RowDecoder
+        starts = decoder.starts
+        sizes = decoder.sizes
+        nulls = decoder.nulls
+
+        for i in self.row_columns:
+            bcol = self.columns[i]
+            if bcol.col_type == MDB_BOOL:
+                # booleans are stored in the null mask: bit set means true
+                bcol.nulls.append(0)
+                bcol.values.append(not nulls[i])
+                continue
+
+            is_null = nulls[i]
+            if is_null:
+                value = None
+            elif not sizes[i]:
+                # a zero length text is an empty string, not a null
+                value = "" if bcol.offsets is not None else None
+            elif bcol.col_type == MDB_MEMO:
+                value = self.lvals.add(buf, starts[i], sizes[i])
+            else:
+                value = self.readers[i](buf, starts[i], sizes[i])
+            if value is None:
+                is_null = 1
+
+            bcol.nulls.append(is_null)
+            if bcol.offsets is not None:
+                bcol.parts.append(value)
+            else:
+                bcol.values.append(value)
+
+    def append_page(self, buf, row_starts, row_sizes, validate):
+        """
+         * Gathers the vectorized columns of the rows at row_starts of the page
+         * in buf, one NumPy fancy-indexing operation per column. The null mask
+         * bits of every row are read in the same step.
+         *
+         * With validate, rows the RowDecoder would reject are dropped first
+         * (only used when no column is decoded row by row).
+        """
+        decoder = self.decoder
+        page = np.frombuffer(buf, dtype=np.uint8)
+        starts = np.asarray(row_starts, dtype=np.int64)
+        sizes = np.asarray(row_sizes, dtype=np.int64)
+
+        for _ in range(2 if validate else 1):
+            ends = starts + sizes - 1
+            if decoder.is_jet3:
+                row_cols = page[starts].astype(np.int64)
+            else:
+                row_cols = page[starts].astype(np.int64) | (page[starts + 1].astype(np.int64) << 8)
+
+            bitmask_sz = (row_cols + 7) // 8
+            nullmask = ends - bitmask_sz + 1
+
+            row_var_cols = np.zeros(len(starts), dtype=np.int64)
+            if decoder.num_var_cols > 0:
+                pos = np.clip(ends - bitmask_sz - (0 if decoder.is_jet3 else 1), 0, len(page) - 2)
+                row_var_cols = page[pos].astype(np.int64)
+                if not decoder.is_jet3:
+                    row_var_cols |= page[pos + 1].astype(np.int64) << 8
+            row_fixed_cols = row_cols - row_var_cols
+
+            if not validate:
+                break
+
+            valid = (bitmask_sz + (0 if decoder.is_jet3 else 1)) < ends
+            if decoder.num_var_cols > 0:
+                valid &= self.valid_var_tables(starts, sizes, ends, bitmask_sz, row_var_cols)
+            for i in self.vector_columns:
+                byte_num, bit_mask, is_fixed, fixed_start, col_size, var_col_num = decoder.plan[i]
+                present = self.fixed_ranks[i] < row_fixed_cols
+                valid &= ~present | (fixed_start + col_size <= sizes)
+            starts = starts[valid]
+            sizes = sizes[valid]
+            validate = False
+
+        offsets = np.arange(len(starts))
+        for i in self.vector_columns:
+            bcol = self.columns[i]
+            byte_num, bit_mask, is_fixed, fixed_start, col_size, var_col_num = decoder.plan[i]
+
+            # logic on nulls is reverse, 1 is not null, 0 is null
+            in_mask = byte_num < bitmask_sz
+            bit_set = in_mask & ((page[np.where(in_mask, nullmask + byte_num, 0)] & bit_mask) != 0)
+            # columns added after a row was written are missing from it, and null
+            present = self.fixed_ranks[i] < row_fixed_cols
+
+            if bcol.col_type == MDB_BOOL:
+                # booleans are stored in the null mask: bit set means true
+                bcol.parts.append((bit_set & present, np.zeros(len(starts), dtype=bool)))
+                continue
+
+            idx = np.where(present, starts + fixed_start, 0)[:, None] + np.arange(col_size)
+            values = page[idx].view(NUMPY_DTYPES[bcol.col_type]).reshape(len(offsets))
+            bcol.parts.append((values, ~(bit_set & present)))
+
+    def valid_var_tables(self, starts, sizes, ends, bitmask_sz, row_var_cols):
+        """
+         * Vectorized sanity checks of the variable column offset tables, the
+         * ones RowDecoder.var_col_offsets3/var_col_offsets4 reject rows for.
+         * Only the tables are checked: gathered columns are all fixed.
+        """
+        if not self.decoder.is_jet3:
+            return bitmask_sz + 3 + row_var_cols * 2 + 2 <= ends
+
+        num_jumps = (sizes - 1) // 256
+        col_ptr = ends - bitmask_sz - num_jumps - 1
+        # If last jump is a dummy value, ignore it
+        num_jumps -= (col_ptr - starts - row_var_cols) // 256 < num_jumps
+
+        return (bitmask_sz + num_jumps + 1 <= ends) & (col_ptr < self.decoder.pg_size) & (col_ptr >= row_var_cols)
+
+    def finish(self):
+        lvals = self.lvals.resolve()
+        for bcol in self.columns:
+            bcol.finish(lvals)
+        self.num_rows = len(self.columns[0]) if self.columns else 0
+        return self
+
+    def column(self, name):
+        for bcol in self.columns:
+            if bcol.name == name:
+                return bcol
+        return None
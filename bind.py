@@ -17,7 +17,10 @@
 """
 
 class Bind:
-    def __init__(self, col_name):
+    __slots__ = ("col_name", "col_num", "col_value", "typed")
+
+    def __init__(self, col_name, typed=False):
         self.col_name = col_name
         self.col_num = -1
         self.col_value = None
+        self.typed = typed  # bind native values (Column.to_value) instead of strings
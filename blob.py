@@ -0,0 +1,69 @@
+"""
+    mdb2csv - Exports tables from mdb file to csv file
+    Copyright (C) 2024  Aléxis Rodrigues de Almeida
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import hashlib
+import os
+
+from lval import LvalResolver
+from utils import safe_file_name
+
+
+class BlobExporter:
+    """
+     * Streams OLE / long binary values out of the LVAL page chain into
+     * sidecar files, one LVAL row at a time, so memory use does not depend
+     * on the size of the value. The exported column gets a reference
+     * "path|size|hash" instead of the value.
+     *
+     * By default each value goes to '<directory>/<table>_<column>_<row>.bin',
+     * with characters not allowed in file names replaced by '_'.
+     * A writer(column, row_num) -> (binary stream, reference path) callable
+     * can be given instead; streams returned by it are not closed.
+    """
+    def __init__(self, directory=None, writer=None, hash_name="sha256"):
+        self.directory = directory
+        self.writer = writer
+        self.hash_name = hash_name
+
+        if directory and not writer:
+            os.makedirs(directory, exist_ok=True)
+
+    def open_blob(self, column, row_num):
+        if self.writer:
+            return self.writer(column, row_num)
+
+        name = f"{safe_file_name(column.table.name)}_{safe_file_name(column.name)}_{row_num}.bin"
+        path = os.path.join(self.directory, name)
+        return open(path, "wb"), path
+
+    def export(self, column, row_num, buf, start, size):
+        # Writes one value and returns its reference
+        out, path = self.open_blob(column, row_num)
+        digest = hashlib.new(self.hash_name)
+
+        def write(chunk):
+            out.write(chunk)
+            digest.update(chunk)
+
+        try:
+            total = LvalResolver(column.mdb.f).stream(buf, start, size, write)
+        finally:
+            if not self.writer:
+                out.close()
+
+        return f"{path}|{total}|{digest.hexdigest()}"
@@ -20,6 +20,8 @@ from consts import MDB_TABLE
 
 
 class Catalog:
+    __slots__ = ("mdb", "object_name", "object_type", "table_pg", "props", "flags")
+
     def __init__(self, mdb):
         self.mdb = mdb
         self.object_name = ""  # [MDB_MAX_OBJ_NAME + 1]
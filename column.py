@@ -16,16 +16,27 @@
     along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
 
+import math
+
 from consts import (MDB_BOOL, MDB_OLE, MDB_NUMERIC, MDB_DATETIME, MDB_BYTE, MDB_INT, MDB_LONGINT,
                     MDB_COMPLEX, MDB_FLOAT, MDB_DOUBLE, MDB_BINARY, MDB_TEXT, MDB_MEMO, MDB_MONEY,
                     MDB_MEMO_OVERHEAD, MDB_REPID)
-from utils import date_to_string, get_byte, get_int16, get_int32, get_single, get_double
+from decimal import Decimal
+
+from lval import LvalResolver
+from utils import date_to_string, get_byte, get_int16, get_int32, get_single, get_double, money_to_string, \
+    numeric_to_string, uuid_to_string, get_int16_signed, get_int32_signed, numeric_to_int, ole_to_datetime, SINT64
 
 
 class Column:
+    __slots__ = ("mdb", "table", "name", "col_type", "col_size", "bind_ptr", "properties", "num_sargs", "sargs",
+                 "idx_sarg_cache", "is_fixed", "query_order", "col_num", "cur_value_start", "cur_value_len",
+                 "cur_blob_pg_row", "chunk_size", "col_prec", "col_scale", "is_long_auto", "is_uuid_auto", "props",
+                 "fixed_offset", "var_col_num", "row_col_num", "text_cache", "text_cache_size")
+
     def __init__(self, mdb):
         self.mdb = mdb
-        self.table: None  # S_MdbTableDef
+        self.table = None  # S_MdbTableDef
         self.name = ""  # [MDB_MAX_OBJ_NAME + 1];
         self.col_type = 0
         self.col_size = 0
@@ -49,14 +60,18 @@ class Column:
         self.fixed_offset = 0
         self.var_col_num = 0
         self.row_col_num = 0
+        self.text_cache = None  # raw bytes -> decoded text, see set_text_cache
+        self.text_cache_size = 0
 
     def attempt_bind(self, isnull, offset, tam):
-        if self.col_type == MDB_BOOL:
+        if self.bind_ptr and self.bind_ptr.typed:
+            self.xfer_bound_value(isnull, offset, tam)
+        elif self.col_type == MDB_BOOL:
             self.xfer_bound_bool(isnull)
         elif isnull:
             self.xfer_bound_data(0, 0)
         elif self.col_type == MDB_OLE:
-            pass
+            self.xfer_bound_ole(offset, tam)
         else:
             self.xfer_bound_data(offset, tam)
 
@@ -70,6 +85,52 @@ class Column:
 
         return 1
 
+    def xfer_bound_ole(self, start, tam):
+        # OLE values are only exported through the table's BlobExporter, as a reference
+        exporter = self.table.blob_exporter if self.table else None
+        if self.bind_ptr:
+            if exporter:
+                self.bind_ptr.col_value = exporter.export(self, self.table.row_num, self.mdb.f.pg_buf, start, tam)
+            else:
+                self.bind_ptr.col_value = ""
+
+        return 1
+
+    def xfer_bound_value(self, isnull, start, tam):
+        """
+         * Typed binding: stores the native value of the column (see to_value)
+         * in bind_ptr.col_value, or None for nulls. No string formatting is done.
+         * OLE values are bound as the BlobExporter reference when the table has
+         * one, else as bytes.
+        """
+        mdb = self.mdb
+
+        if self.col_type == MDB_BOOL:
+            # booleans are stored in the null mask: bit set means true
+            self.cur_value_len = isnull
+            value = not isnull
+        elif isnull or not tam:
+            self.cur_value_start = 0
+            self.cur_value_len = 0
+            # a zero length text is an empty string, not a null
+            value = "" if not isnull and self.col_type in (MDB_TEXT, MDB_MEMO) else None
+        else:
+            self.cur_value_start = start
+            self.cur_value_len = tam
+            if self.col_type == MDB_OLE:
+                exporter = self.table.blob_exporter if self.table else None
+                if exporter:
+                    value = exporter.export(self, self.table.row_num, mdb.f.pg_buf, start, tam)
+                elif tam < MDB_MEMO_OVERHEAD:
+                    value = None
+                else:
+                    value = bytes(LvalResolver(mdb.f).read(mdb.f.pg_buf, start, tam))
+            else:
+                value = self.to_value(mdb.f.pg_buf, start, tam)
+
+        self.bind_ptr.col_value = value
+        return 1
+
     def xfer_bound_data(self, start, tam):
         if tam:
             self.cur_value_start = start
@@ -98,6 +159,29 @@ class Column:
 
         return 0
 
+    def set_text_cache(self, size):
+        """
+         * Enables a cache of up to 'size' distinct values mapping the raw bytes
+         * of a text value to its decoded string. Once full, new values are
+         * decoded without being cached. Meant for low cardinality columns.
+        """
+        self.text_cache = {} if size > 0 else None
+        self.text_cache_size = size
+
+    def decode_text(self, raw):
+        cache = self.text_cache
+        if cache is None:
+            return self.mdb.f.unicode2ascii(raw)
+
+        key = bytes(raw)
+        text = cache.get(key)
+        if text is None:
+            text = self.mdb.f.unicode2ascii(key)
+            if len(cache) < self.text_cache_size:
+                cache[key] = text
+
+        return text
+
     def is_shortdate(self):
         fmt = self.get_prop("Format")
         return fmt and fmt == "Short Date"
@@ -110,67 +194,17 @@ class Column:
 
     def memo_to_string(self, start, size):
         mdb = self.mdb
-        buf = mdb.f.pg_buf
-        pg_buf = buf
 
         if size < MDB_MEMO_OVERHEAD:
             return ""
 
-        # The 32 bit integer at offset 0 is the length of the memo field
-        #   with some flags in the high bits.
-        # The 32 bit integer at offset 4 contains page and row information.
-
-        memo_len = get_int32(pg_buf, start)
-
-        if memo_len & 0x80000000:
-            # inline memo field
-            temp = pg_buf[start + MDB_MEMO_OVERHEAD: start + MDB_MEMO_OVERHEAD + (size - MDB_MEMO_OVERHEAD)]
-            text = self.mdb.f.unicode2ascii(temp)
-            return text
-        elif memo_len & 0x40000000:
-            # single-page memo field
-            pg_row = get_int32(pg_buf, start + 4)
-            ret, buf, row_start, tam = mdb.f.find_pg_row(pg_row)
-            if ret == -1:
-                return ""
-
-            temp = buf[row_start, row_start + tam]
-            text = mdb.f.unicode2ascii(mdb, temp)
-            return text
-        elif (memo_len & 0xff000000) == 0:  # assume all flags in MSB
-            # multi-page memo field
-            tmp = []
-            tmpoff = 0
-
-            pg_row = get_int32(pg_buf, start + 4)
-            while True:
-                ret, buf, row_start, tam = self.mdb.f.find_pg_row(pg_row)
-                if not row_start:
-                    return ""
-
-                if (tmpoff + tam - 4) > memo_len:
-                    break
-
-                # Stop processing on zero length multiple page memo fields
-                if tam < 4:
-                    break
-
-                tmp += buf[row_start + 4: row_start + 4 + tam - 4]
-                tmpoff += tam - 4
-
-                pg_row = get_int32(buf, row_start)
-
-                if not pg_row:
-                    break
-
-            if tmpoff < memo_len:
-                print("Warning: incorrect memo length")
-
-            text = self.mdb.f.unicode2ascii(tmp)
-            return text
-        else:
-            print(f"Unhandled memo field flags = {memo_len >> 24}")
-            return ""
+        # values of the current page prefetched by Table.prefetch_memos
+        memos = self.table.page_memos if self.table else None
+        value = memos.get((self.table.cur_row, self.col_num)) if memos else None
+        if value is None:
+            value = LvalResolver(mdb.f).read(mdb.f.pg_buf, start, size)
+
+        return mdb.f.unicode2ascii(value)
 
     def to_string(self, buf, start, size):
         datatype = self.col_type
@@ -186,43 +220,70 @@ class Column:
             text = str(tf).split(".")[0]
         elif datatype == MDB_DOUBLE:
             td = get_double(buf, start)
-            text = str(td).split(".")[0]
+            # truncated to an integer, as get_double used to return
+            text = str(int(td)) if math.isfinite(td) else str(td)
         elif datatype == MDB_BINARY:
             if size < 0:
                 text = ""
             else:
-                text = buf[start: start + size]
+                text = bytes(buf[start: start + size])
         elif datatype == MDB_TEXT:
             if size < 0:
                 text = ""
             else:
-                text = self.mdb.f.unicode2ascii(buf[start: start + size])
+                text = self.decode_text(buf[start: start + size])
         elif datatype == MDB_DATETIME:
             text = date_to_string(self.mdb.date_fmt, buf, start)
         elif datatype == MDB_MEMO:
             text = self.memo_to_string(start, size)
         elif datatype == MDB_MONEY:
-            # text = mdb_money_to_string(mdb, start)
-            text = ""
-            pass
+            text = money_to_string(buf, start)
         elif datatype == MDB_REPID:
-            # text = mdb_uuid_to_string_fmt(buf, start, mdb.repid_fmt)
-            text = ""
-            pass
+            text = uuid_to_string(buf, start, self.mdb.repid_fmt)
+        elif datatype == MDB_NUMERIC:
+            text = numeric_to_string(buf, start, self.col_scale)
         else:
             print(f"Warning: mdb_col_to_string called on unsupported data type {datatype}")
             text = ""
 
         return text
 
-    def numeric_to_string(self, start):
-        #   scale = self.col_scale
-        #   prec = self.col_prec
-        num_bytes = 16
-        b = self.mdb.f.pg_buf[start + 1: start + 1 + num_bytes]
+    def to_value(self, buf, start, size):
+        """
+         * Native value of a non null column value:
+         *   MDB_BYTE, MDB_INT, MDB_LONGINT: int
+         *   MDB_FLOAT, MDB_DOUBLE: float
+         *   MDB_DATETIME: datetime (None when out of range)
+         *   MDB_MONEY, MDB_NUMERIC: Decimal
+         *   MDB_TEXT, MDB_MEMO, MDB_REPID: str
+         *   others: bytes
+        """
+        datatype = self.col_type
+
+        if datatype == MDB_BYTE:
+            return get_byte(buf, start)
+        elif datatype == MDB_INT:
+            return get_int16_signed(buf, start)
+        elif datatype in [MDB_LONGINT, MDB_COMPLEX]:
+            return get_int32_signed(buf, start)
+        elif datatype == MDB_FLOAT:
+            return get_single(buf, start)
+        elif datatype == MDB_DOUBLE:
+            return get_double(buf, start)
+        elif datatype == MDB_TEXT:
+            return self.decode_text(buf[start: start + size])
+        elif datatype == MDB_DATETIME:
+            return ole_to_datetime(get_double(buf, start))
+        elif datatype == MDB_MEMO:
+            return self.memo_to_string(start, size)
+        elif datatype == MDB_MONEY:
+            return Decimal(SINT64.unpack_from(buf, start)[0]).scaleb(-4)
+        elif datatype == MDB_REPID:
+            return uuid_to_string(buf, start, self.mdb.repid_fmt)
+        elif datatype == MDB_NUMERIC:
+            return Decimal(numeric_to_int(buf, start)).scaleb(-self.col_scale)
 
-        s = 0
-        for i in range(num_bytes):
-            s = s * 16 + b[i]
+        return bytes(buf[start: start + size])
 
-        return str(s)
+    def numeric_to_string(self, start):
+        return numeric_to_string(self.mdb.f.pg_buf, start, self.col_scale)
@@ -109,6 +109,10 @@ MDB_BINEXPORT_RAW = 1
 MDB_BINEXPORT_OCTAL = 2
 MDB_BINEXPORT_HEXADECIMAL = 3
 
+MDB_QUOTE_MINIMAL = 0
+MDB_QUOTE_ALL = 1
+MDB_QUOTE_NONE = 2
+
 """
 #define MDB_PGSIZE 4096
 //#define MDB_MAX_OBJ_NAME (256*3) /* unicode 16 -> utf-8 worst case */
@@ -0,0 +1,152 @@
+"""
+    mdb2csv - Exports tables from mdb file to csv file
+    Copyright (C) 2024  Aléxis Rodrigues de Almeida
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import codecs
+from datetime import datetime
+from decimal import Decimal
+
+from consts import (MDB_BINEXPORT_RAW, MDB_BINEXPORT_OCTAL, MDB_BINEXPORT_HEXADECIMAL, MDB_QUOTE_MINIMAL,
+                    MDB_QUOTE_ALL, MDB_QUOTE_NONE, boolean_false_number, boolean_true_number)
+from utils import format_datetime, single_to_string
+
+# Encodings without a byte order mark, by the BOM other encodings write first
+BOM_FREE_ENCODINGS = ((codecs.BOM_UTF32_LE, "utf-32-le"), (codecs.BOM_UTF32_BE, "utf-32-be"),
+                      (codecs.BOM_UTF8, "utf-8"), (codecs.BOM_UTF16_LE, "utf-16-le"),
+                      (codecs.BOM_UTF16_BE, "utf-16-be"))
+
+
+def bom_free_encoding(encoding):
+    """
+     * Returns the encoding producing the same bytes as 'encoding' without the
+     * leading BOM (e.g. utf-8 for utf-8-sig), or 'encoding' when it writes none.
+     * Used for files that are appended to one written with 'encoding'.
+    """
+    bom = "".encode(encoding)
+    for prefix, name in BOM_FREE_ENCODINGS:
+        if bom == prefix:
+            return name
+
+    return encoding
+
+
+class CsvWriter:
+    """
+     * Writes delimited text. Each row is built as one string and rows are
+     * written 'rows_per_write' at a time through a 'buffer_size' byte buffer.
+     *
+     * quoting: MDB_QUOTE_MINIMAL quotes values containing the delimiter, the
+     *   quote character or line breaks; MDB_QUOTE_ALL quotes every non null
+     *   value; MDB_QUOTE_NONE never quotes.
+     * escape_char: escapes quote characters inside quoted values; when None
+     *   they are doubled.
+     * bin_mode: how bytes values are written (MDB_BINEXPORT_*).
+     *
+     * Native values (typed binding) are formatted here: datetimes with
+     * date_fmt, floats with float_format (a format() spec, repr when None,
+     * at 32 bit precision for the positions in single_columns), Decimals in
+     * fixed point and bools as true_text / false_text. None is written as
+     * null_text and "" as an empty value ('""' under MDB_QUOTE_ALL).
+    """
+    def __init__(self, out_file, delimiter=";", row_delimiter="\n", quote_char='"', quoting=MDB_QUOTE_MINIMAL,
+                 escape_char=None, null_text="", bin_mode=MDB_BINEXPORT_HEXADECIMAL, encoding="utf-8",
+                 buffer_size=1024 * 1024, rows_per_write=1000, date_fmt="%x %X", float_format=None,
+                 true_text=boolean_true_number, false_text=boolean_false_number, single_columns=()):
+        self.delimiter = delimiter
+        self.row_delimiter = row_delimiter
+        self.quote_char = quote_char
+        self.quoting = quoting if quote_char else MDB_QUOTE_NONE
+        self.escaped_quote = (escape_char or quote_char) + quote_char if quote_char else ""
+        self.null_text = null_text
+        self.bin_mode = bin_mode
+        self.date_fmt = date_fmt
+        self.float_format = float_format
+        self.single_columns = frozenset(single_columns)
+        self.true_text = true_text
+        self.false_text = false_text
+        self.rows_per_write = rows_per_write
+        self.rows = []
+        self.special = (delimiter, quote_char, "\n", "\r") if quote_char else ()
+        self.stream = open(out_file, "w", encoding=encoding, newline="", buffering=buffer_size)
+
+    def format_binary(self, value):
+        value = bytes(value)
+        if self.bin_mode == MDB_BINEXPORT_HEXADECIMAL:
+            return value.hex().upper()
+        elif self.bin_mode == MDB_BINEXPORT_OCTAL:
+            return "".join(f"\\{c:03o}" for c in value)
+        elif self.bin_mode == MDB_BINEXPORT_RAW:
+            return value.decode("latin-1")
+
+        return ""  # MDB_BINEXPORT_STRIP
+
+    def quote(self, text):
+        if self.quoting == MDB_QUOTE_NONE:
+            return text
+        if self.quoting == MDB_QUOTE_MINIMAL and not any(c in text for c in self.special):
+            return text
+
+        q = self.quote_char
+        return q + text.replace(q, self.escaped_quote) + q
+
+    def format_value(self, value, single=False):
+        # Text of a non null native value; single: value of a 32 bit float column
+        if isinstance(value, bool):
+            return self.true_text if value else self.false_text
+        elif isinstance(value, int):
+            return str(value)
+        elif isinstance(value, float):
+            if self.float_format:
+                return format(value, self.float_format)
+            return single_to_string(value) if single else repr(value)
+        elif isinstance(value, Decimal):
+            return format(value, "f")
+        elif isinstance(value, datetime):
+            return format_datetime(self.date_fmt, value)
+
+        return self.format_binary(value)
+
+    def format_row(self, values):
+        # values: str, native values, bytes-like (binary) or None (null)
+        texts = []
+        for i, value in enumerate(values):
+            if value is None:
+                texts.append(self.null_text)
+            elif isinstance(value, str):
+                # under MDB_QUOTE_ALL "" is written quoted, apart from nulls
+                texts.append(self.quote(value) if value or self.quoting == MDB_QUOTE_ALL else "")
+            else:
+                texts.append(self.quote(self.format_value(value, i in self.single_columns)))
+
+        return self.delimiter.join(texts) + self.row_delimiter
+
+    def write_row(self, values):
+        self.rows.append(self.format_row(values))
+        if len(self.rows) >= self.rows_per_write:
+            self.flush()
+
+    def write_header(self, names):
+        self.write_row(names)
+
+    def flush(self):
+        if self.rows:
+            self.stream.write("".join(self.rows))
+            self.rows = []
+
+    def close(self):
+        self.flush()
+        self.stream.close()
@@ -18,6 +18,8 @@
 
 
 class Field:
+    __slots__ = ("mdb", "value", "siz", "start", "is_null", "is_fixed", "colnum", "offset")
+
     def __init__(self, mdb):
         self.mdb = mdb
         self.value = None
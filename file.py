@@ -16,18 +16,30 @@
     along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
 
+import codecs
+import mmap
 import os.path
+import threading
+from array import array
 
+from page_cache import PageCache
 from consts import (MDB_WRITABLE, MDB_VER_JET3, MDB_VER_JET4, MDB_VER_ACCDB_2007, MDB_VER_ACCDB_2010,
                     MDB_VER_ACCDB_2013, MDB_VER_ACCDB_2016, MDB_VER_ACCDB_2019, OFFSET_MASK)
 from utils import get_byte, mdbi_rc4, get_int16, get_int32, get_single, get_double, decompress_unicode
 
+# positions of the bits set in each byte value, used to decode usage bitmaps a byte at a time
+BIT_POSITIONS = tuple(tuple(bit for bit in range(8) if byte & (1 << bit)) for byte in range(256))
+
 
 class MdbFile:
-    def __init__(self, mdb, filename):
+    def __init__(self, mdb, filename, use_mmap=True, cache_pages=256, cache_bytes=0):
         self.mdb = mdb
         self.filename = filename
         self.stream = None
+        self.use_mmap = use_mmap
+        self.mmap = None
+        self.map = None  # memoryview over the mapped file when use_mmap is set
+        self.lock = threading.Lock()  # serializes seek/read on the stream
         self.writable = False
         self.jet_version = 0
         self.db_key = 0  # [0, 0, 0, 0]
@@ -36,9 +48,11 @@ class MdbFile:
         self.free_map = ""
         self.refs = 0
         self.code_page = 0
+        self.codec = "cp1252"  # Jet3 text encoding, from code_page
         self.lang_id = 0
         self.pg_buf = ""  # MDB_PGSIZE
         self.alt_pg_buf = ""  # MDB_PGSIZE
+        self.cache = PageCache(cache_pages, cache_bytes)
         self.cur_pg = 0
         self.cur_pos = 0
 
@@ -131,6 +145,9 @@ class MdbFile:
         if self.mdb.flags and MDB_WRITABLE:
             self.writable = True
 
+        if self.use_mmap:
+            self.map_stream()
+
         if not self.read_pg(0):
             print("Couldn't read first page.")
             # mdb_close(mdb)
@@ -149,10 +166,13 @@ class MdbFile:
             print(f"Unknown Jet version: {self.jet_version}")
             return None
 
+        # page 0 was read with the default page size
+        self.cache.clear()
+
         tmp_key = bytes([0xC7, 0xDA, 0x39, 0x6B])
         tam = 126 if self.jet_version == MDB_VER_JET3 else 128
         ret = mdbi_rc4(tmp_key, self.pg_buf[0x18: 0x18 + tam])
-        self.pg_buf = self.pg_buf[:0x18] + ret + self.pg_buf[0x18 + tam:]
+        self.pg_buf = b"".join((self.pg_buf[:0x18], ret, self.pg_buf[0x18 + tam:]))
 
         if self.jet_version == MDB_VER_JET3:
             self.lang_id = get_int16(self.pg_buf, 0x3a)
@@ -160,6 +180,7 @@ class MdbFile:
             self.lang_id = get_int16(self.pg_buf, 0x6e)
 
         self.code_page = get_int16(self.pg_buf, 0x3c)
+        self.codec = self.code_page_codec(self.code_page)
         self.db_key = get_int32(self.pg_buf, 0x3e)
 
         if self.jet_version == MDB_VER_JET3:
@@ -167,47 +188,123 @@ class MdbFile:
             # Bug - JET3 supports 20 byte passwords, this is currently just 14 bytes
             self.db_passwd = self.pg_buf[0x42: 0x42 + len(self.db_passwd)]
 
+    @staticmethod
+    def code_page_codec(code_page):
+        # Python codec of a Windows code page, cp1252 if it isn't known
+        try:
+            return codecs.lookup(f"cp{code_page}").name
+        except LookupError:
+            return "cp1252"
+
+    def map_stream(self):
+        """
+         * Maps the whole file in memory so pages are served as memoryview
+         * slices instead of seek/read calls. Falls back to plain stream reads
+         * when the file can't be mapped (empty file, pipe, ...).
+        """
+        try:
+            self.mmap = mmap.mmap(self.stream.fileno(), 0, access=mmap.ACCESS_READ)
+            self.map = memoryview(self.mmap)
+        except (OSError, ValueError):
+            self.mmap = None
+            self.map = None
+
     def read_pg(self, pg):
         if pg and self.cur_pg == pg:
             return self.pg_size
 
-        self.pg_buf = self._read_pg(pg)
+        self.pg_buf = self.get_pg(pg)
         # print(f"read page {pg} type {self.pg_buf[0]}")
         self.cur_pg = pg
         self.cur_pos = 0
         return len(self.pg_buf)
 
     def read_alt_pg(self, pg):
-        self.alt_pg_buf = self._read_pg(pg)
+        self.alt_pg_buf = self.get_pg(pg)
         return len(self.alt_pg_buf)
 
+    def get_pg(self, pg):
+        # Returns the (decrypted) buffer of page pg, going through the page cache
+        buf = self.cache.get(pg)
+        if buf is None:
+            buf = self._read_pg(pg)
+            if len(buf) == self.pg_size:
+                self.cache.put(pg, buf)
+
+        return buf
+
     def _read_pg(self, pg):
         offset = pg * self.pg_size
 
-        if self.stream.seek(0, 2) == -1:
-            print("Unable to seek to end of file")
-            return 0
+        if self.map is not None:
+            if len(self.map) < offset:
+                print(f"offset {offset} is beyond EOF")
+                return b""
 
-        if self.stream.tell() < offset:
-            print(f"offset {offset} is beyond EOF")
-            return 0
+            dados = self.map[offset: offset + self.pg_size]
+            return self.decrypt_pg(pg, dados) if self.db_key else dados
 
-        if self.stream.seek(offset) == -1:
-            print(f"Unable to seek to page {pg}")
-            return 0
+        with self.lock:
+            if self.stream.seek(0, 2) == -1:
+                print("Unable to seek to end of file")
+                return b""
 
-        dados = self.stream.read(self.pg_size)
+            if self.stream.tell() < offset:
+                print(f"offset {offset} is beyond EOF")
+                return b""
 
-        if pg != 0 and self.db_key != 0:
-            tmp_key_i = self.db_key ^ pg
+            if self.stream.seek(offset) == -1:
+                print(f"Unable to seek to page {pg}")
+                return b""
+
+            dados = self.stream.read(self.pg_size)
 
-            tmp_key = [tmp_key_i & 0xFF, (tmp_key_i >> 8) & 0xFF,
-                       (tmp_key_i >> 16) & 0xFF, (tmp_key_i >> 24) & 0xFF]
+        return self.decrypt_pg(pg, dados) if self.db_key else dados
 
+    def decrypt_pg(self, pg, dados):
+        # Page 0 is never encoded; every other page uses its own RC4 key (db_key ^ pg)
+        if pg != 0 and self.db_key != 0:
+            tmp_key = ((self.db_key ^ pg) & 0xFFFFFFFF).to_bytes(4, "little")
             dados = mdbi_rc4(tmp_key, dados)
 
         return dados
 
+    def load_pg_run(self, first_pg, count):
+        """
+         * Reads count consecutive pages starting at first_pg with a single
+         * read, decrypts them if the file is encoded and stores them in the
+         * page cache. Pages already in the cache are left untouched, so each
+         * page is decrypted only once while it stays cached.
+         *
+         * Returns the number of pages available after the call.
+        """
+        offset = first_pg * self.pg_size
+        tam = count * self.pg_size
+
+        if self.map is not None:
+            raw = self.map[offset: offset + tam]
+            if hasattr(mmap, "MADV_WILLNEED") and raw:
+                # let the kernel fault the run in ahead of the decoder
+                start = offset - offset % mmap.PAGESIZE
+                self.mmap.madvise(mmap.MADV_WILLNEED, start, offset + len(raw) - start)
+        else:
+            with self.lock:
+                if self.stream.seek(offset) == -1:
+                    print(f"Unable to seek to page {first_pg}")
+                    return 0
+                raw = memoryview(self.stream.read(tam))
+
+        loaded = len(raw) // self.pg_size
+        for i in range(loaded):
+            pg = first_pg + i
+            if pg in self.cache:
+                continue
+
+            dados = raw[i * self.pg_size: (i + 1) * self.pg_size]
+            self.cache.put(pg, self.decrypt_pg(pg, dados) if self.db_key else dados)
+
+        return loaded
+
     def pg_get_byte(self, offset):
         if offset < 0 or offset + 1 > self.pg_size:
             return -1
@@ -254,11 +351,6 @@ class MdbFile:
     def get_pos(self):
         return self.cur_pos
 
-    def swap_pgbuf(self):
-        tmpbuf = self.pg_buf
-        self.pg_buf = self.alt_pg_buf
-        self.alt_pg_buf = tmpbuf
-
     def find_pg_row(self, pg_row):
         """
          * mdb_find_pg_row
@@ -277,21 +369,21 @@ class MdbFile:
         if self.read_alt_pg(pg) != self.pg_size:
             return -1, -1, -1, None
 
-        self.swap_pgbuf()
-        result, off, tam = self.find_row(row)
-        self.swap_pgbuf()
-        off &= OFFSET_MASK
         buf = self.alt_pg_buf
+        result, off, tam = self.find_row(row, buf)
+        off &= OFFSET_MASK
         return result, buf, off, tam
 
-    def find_row(self, row):
+    def find_row(self, row, buf=None):
         rco = self.row_count_offset
+        if buf is None:
+            buf = self.pg_buf
 
         if row > 1000:
             return -1, -1, 0
 
-        start = get_int16(self.pg_buf, rco + 2 + row * 2)
-        next_start = self.pg_size if row == 0 else get_int16(self.pg_buf, rco + row * 2) & OFFSET_MASK
+        start = get_int16(buf, rco + 2 + row * 2)
+        next_start = self.pg_size if row == 0 else get_int16(buf, rco + row * 2) & OFFSET_MASK
         tam = next_start - (start & OFFSET_MASK)
 
         if ((start & OFFSET_MASK) >= self.pg_size or (start & OFFSET_MASK) > next_start or
@@ -301,7 +393,13 @@ class MdbFile:
         return 0, start, tam
 
     def read_pg_if_n(self, cur_pos, tam):
-        buf = []
+        """
+         * Reads tam bytes starting at cur_pos, following the page chain
+         * (next page number at offset 4) when the value crosses a page.
+         * Returns a memoryview into the page when the value fits in it and
+         * only joins the pieces into new bytes when it crosses pages.
+        """
+        pieces = []
 
         if cur_pos < 0:
             return None
@@ -312,20 +410,22 @@ class MdbFile:
                 return None
             cur_pos -= (self.pg_size - 8)
 
-        # Copy pages into buffer
+        # Collect the pieces of every page crossed
         while (cur_pos + tam) >= self.pg_size:
             piece_len = self.pg_size - cur_pos
 
-            buf += self.pg_buf[cur_pos: cur_pos + piece_len]
+            pieces.append(memoryview(self.pg_buf)[cur_pos: cur_pos + piece_len])
 
             tam -= piece_len
             if not self.read_pg(get_int32(self.pg_buf, 4)):
                 return None
             cur_pos = 8
 
-        # Copy into buffer from final page
-        if tam:
-            buf += self.pg_buf[cur_pos: cur_pos + tam]
+        # Final page
+        buf = memoryview(self.pg_buf)[cur_pos: cur_pos + tam]
+        if pieces:
+            pieces.append(buf)
+            buf = b"".join(pieces)
 
         cur_pos += tam
 
@@ -345,20 +445,15 @@ class MdbFile:
 
     def unicode2ascii(self, src):
         is_jet3 = (self.jet_version == MDB_VER_JET3)
-        slen = len(src) - 2
-
-        if not is_jet3 and slen >= 2 and (src[0] & 0xff) == 0xff and (src[1] & 0xff) == 0xfe:
-            tmp = [0] * (slen * 2)
-            decompress_unicode(src[2:], tmp)
-            src = bytes(tmp)
 
+        # str() decodes any buffer object (bytes, memoryview, mmap slice) without copying it first
         if is_jet3:
-            saida = src.decode('utf-8')
-        else:
-            saida = src.decode('utf-16')
-        # ascii_str = unicode_str.encode('ascii', 'ignore').decode('ascii')
+            return str(src, self.codec, 'replace')
 
-        return saida  # bytes(ascii_str)
+        if len(src) >= 2 and src[0] == 0xff and src[1] == 0xfe:
+            return decompress_unicode(src[2:])
+
+        return str(src, 'utf-16-le', 'replace')
 
     def map_find_next0(self, p_map, map_sz, start_pg):
         if map_sz < 5:
@@ -387,13 +482,15 @@ class MdbFile:
         """
 
         usage_bitlen = (self.pg_size - 4) * 8
-        max_map_pgs = (map_sz - 1) / 4
-        map_ind = (start_pg + 1) / usage_bitlen
+        max_map_pgs = (map_sz - 1) // 4
+        map_ind = (start_pg + 1) // usage_bitlen
         offset = (start_pg + 1) % usage_bitlen
 
         while map_ind < max_map_pgs:
             map_pg = get_int32(p_map, (map_ind * 4) + 1)
             if not map_pg:
+                offset = 0
+                map_ind += 1
                 continue
 
             if self.read_alt_pg(map_pg) != self.pg_size:
@@ -421,3 +518,42 @@ class MdbFile:
 
         print(f"Warning: unrecognized usage map type: {p_map[0]}")
         return -1
+
+    def map_pages(self, p_map, map_sz):
+        """
+         * Decodes a whole usage map into a sorted array of page numbers.
+         * Bitmaps are scanned a byte at a time, skipping empty bytes.
+         *
+         * Returns None on error (unsupported map type or unreadable map page).
+        """
+        pages = array("I")
+
+        if p_map[0] == 0:
+            if map_sz < 5:
+                return pages
+            self.map_bitmap_pages(pages, p_map[5:map_sz], get_int32(p_map, 1))
+        elif p_map[0] == 1:
+            usage_bitlen = (self.pg_size - 4) * 8
+            for map_ind in range((map_sz - 1) // 4):
+                map_pg = get_int32(p_map, (map_ind * 4) + 1)
+                if not map_pg:
+                    continue
+
+                buf = self.get_pg(map_pg)
+                if len(buf) != self.pg_size:
+                    print(f"Oops! didn't get a full page at {map_pg}")
+                    return None
+
+                self.map_bitmap_pages(pages, buf[4:], map_ind * usage_bitlen)
+        else:
+            print(f"Warning: unrecognized usage map type: {p_map[0]}")
+            return None
+
+        return pages
+
+    @staticmethod
+    def map_bitmap_pages(pages, bitmap, first_pg):
+        for i, byte in enumerate(bitmap):
+            if byte:
+                base = first_pg + i * 8
+                pages.extend([base + bit for bit in BIT_POSITIONS[byte]])
@@ -0,0 +1,171 @@
+"""
+    mdb2csv - Exports tables from mdb file to csv file
+    Copyright (C) 2024  Aléxis Rodrigues de Almeida
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+from consts import MDB_MEMO_OVERHEAD, OFFSET_MASK
+from utils import get_int32
+
+LVAL_INLINE = 0x80000000
+LVAL_SINGLE_PAGE = 0x40000000
+
+
+class LvalResolver:
+    """
+     * Fetches long values (memo/OLE fields) stored in LVAL pages.
+     *
+     * The 32 bit integer at offset 0 of the field is the length of the value
+     * with some flags in the high bits; the 32 bit integer at offset 4
+     * contains page and row information (pg_row) of the first LVAL row.
+     *
+     * Values are queued with add() and fetched together by resolve(): the
+     * pending LVAL rows are sorted by page, so each LVAL page is read once
+     * per round instead of once per value. Multi-page values take one round
+     * per link of their chain.
+    """
+    def __init__(self, f):
+        self.f = f
+        self.results = []
+        self.pending = []  # [key, pg_row, memo_len, chunks, tmpoff]
+
+    def add(self, buf, start, size):
+        """
+         * Queues the long value whose field header is at buf[start:start + size].
+         * Returns the key of the value in the list returned by resolve().
+        """
+        key = len(self.results)
+        self.results.append(b"")
+
+        if size < MDB_MEMO_OVERHEAD:
+            return key
+
+        memo_len = get_int32(buf, start)
+        pg_row = get_int32(buf, start + 4)
+
+        if memo_len & LVAL_INLINE:
+            self.results[key] = bytes(buf[start + MDB_MEMO_OVERHEAD: start + size])
+        elif memo_len & LVAL_SINGLE_PAGE:
+            self.pending.append([key, pg_row, -1, None, 0])
+        elif (memo_len & 0xff000000) == 0:  # assume all flags in MSB
+            self.pending.append([key, pg_row, memo_len, [], 0])
+        else:
+            print(f"Unhandled memo field flags = {memo_len >> 24}")
+
+        return key
+
+    def stream(self, buf, start, size, write):
+        """
+         * Passes the long value whose field header is at buf[start:start + size]
+         * to write() one LVAL row at a time, without ever holding the whole
+         * value in memory. Returns the number of bytes written.
+        """
+        if size < MDB_MEMO_OVERHEAD:
+            return 0
+
+        memo_len = get_int32(buf, start)
+        pg_row = get_int32(buf, start + 4)
+
+        if memo_len & LVAL_INLINE:
+            chunk = buf[start + MDB_MEMO_OVERHEAD: start + size]
+            write(chunk)
+            return len(chunk)
+        elif memo_len & LVAL_SINGLE_PAGE:
+            lval_buf, row_start, tam = self.find_lval_row(pg_row, {})
+            if lval_buf is None:
+                return 0
+            write(lval_buf[row_start: row_start + tam])
+            return tam
+        elif (memo_len & 0xff000000) != 0:
+            print(f"Unhandled memo field flags = {memo_len >> 24}")
+            return 0
+
+        # multi-page value: each row starts with the pg_row of the next one
+        tmpoff = 0
+        while pg_row:
+            lval_buf, row_start, tam = self.find_lval_row(pg_row, {})
+            if lval_buf is None or (tmpoff + tam - 4) > memo_len or tam < 4:
+                break
+
+            write(lval_buf[row_start + 4: row_start + tam])
+            tmpoff += tam - 4
+            pg_row = get_int32(lval_buf, row_start)
+
+        if tmpoff < memo_len:
+            print("Warning: incorrect memo length")
+
+        return tmpoff
+
+    def read(self, buf, start, size):
+        # Fetches a single long value
+        key = self.add(buf, start, size)
+        return self.resolve()[key]
+
+    def find_lval_row(self, pg_row, pages):
+        pg = pg_row >> 8
+        buf = pages.get(pg)
+        if buf is None:
+            buf = pages[pg] = self.f.get_pg(pg)
+
+        if len(buf) != self.f.pg_size:
+            return None, 0, 0
+
+        ret, row_start, tam = self.f.find_row(pg_row & 0xff, buf)
+        if ret == -1:
+            return None, 0, 0
+
+        return buf, row_start & OFFSET_MASK, tam
+
+    def resolve(self):
+        """
+         * Fetches every queued value. Returns the list of values (bytes)
+         * indexed by the keys returned by add(); unreadable values are empty.
+        """
+        pending = self.pending
+        while pending:
+            pending.sort(key=lambda entry: entry[1])
+            pages = {}  # pages read in this round
+            next_round = []
+
+            for entry in pending:
+                key, pg_row, memo_len, chunks, tmpoff = entry
+                buf, row_start, tam = self.find_lval_row(pg_row, pages)
+                if buf is None:
+                    continue
+
+                if chunks is None:
+                    # single-page value: the whole row
+                    self.results[key] = buf[row_start: row_start + tam]
+                    continue
+
+                # multi-page value: each row starts with the pg_row of the next one
+                done = (tmpoff + tam - 4) > memo_len or tam < 4
+                if not done:
+                    chunks.append(buf[row_start + 4: row_start + tam])
+                    entry[4] = tmpoff = tmpoff + tam - 4
+                    entry[1] = get_int32(buf, row_start)
+                    done = not entry[1]
+
+                if done:
+                    if tmpoff < memo_len:
+                        print("Warning: incorrect memo length")
+                    self.results[key] = b"".join(chunks)
+                else:
+                    next_round.append(entry)
+
+            pending = next_round
+
+        self.pending = []
+        return self.results
@@ -16,16 +16,49 @@
     along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
 
+import os
+import shutil
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+
 from bind import Bind
 from consts import MDB_BIND_SIZE, boolean_false_number, boolean_true_number, MDB_BRACES_4_2_2_8, MDB_ANY
 from file import MdbFile
+from page_index import PageIndex
+from sqlite_export import BULK_LOAD_PRAGMAS, load_table, create_index_sql
 from catalog import Catalog
+from csv_writer import bom_free_encoding
 from consts import MDB_TABLE
 from table import Table
+from utils import safe_file_name
+
+
+def export_table_worker(filename, mdb_options, name, out_file, export_options, page_range=None, settings=None):
+    """
+     * Exports one table, or the data pages page_range = (start, stop) of it,
+     * in a worker process, opening its own MdbFile with the parent's
+     * format settings (see Mdb.format_settings).
+     * Returns (rows, seconds, error).
+    """
+    started = time.perf_counter()
+    try:
+        mdb = Mdb(filename, **mdb_options)
+        if settings:
+            mdb.apply_settings(settings)
+        table = mdb.read_table_by_name(name)
+        if not table:
+            return 0, time.perf_counter() - started, f"Table {name} not found"
+        if page_range:
+            table.set_page_range(*page_range)
+        rows = table.export(out_file, **export_options)
+        return rows, time.perf_counter() - started, None
+    except Exception as e:
+        return 0, time.perf_counter() - started, f"{type(e).__name__}: {e}"
 
 
 class Mdb:
-    def __init__(self, filename):
+    def __init__(self, filename, use_mmap=True, cache_pages=256, cache_bytes=0, page_index_sidecar=False):
         self.guint32 = 0
         self.guint16 = 0
         self.row_num = 0
@@ -39,6 +72,8 @@ class Mdb:
         self.num_catalog = 0
         self.catalog = []  # MdbCatalogEntry
         self.flags = 0
+        self.page_index = None  # PageIndex
+        self.page_index_sidecar = page_index_sidecar
 
         self.date_fmt = "%x %X"
         self.shortdate_fmt = "%x"
@@ -48,7 +83,9 @@ class Mdb:
 
         self.repid_fmt = MDB_BRACES_4_2_2_8
 
-        self.f = MdbFile(self, filename)
+        self.options = {"use_mmap": use_mmap, "cache_pages": cache_pages, "cache_bytes": cache_bytes,
+                        "page_index_sidecar": page_index_sidecar}
+        self.f = MdbFile(self, filename, use_mmap, cache_pages, cache_bytes)
 
         self.read_catalog(MDB_TABLE)
 
@@ -61,6 +98,28 @@ class Mdb:
 
         return None
 
+    def get_page_index(self):
+        """
+         * Returns the page type/owner index of the file, building it on first
+         * use. With page_index_sidecar set it is loaded from / saved to
+         * '<filename>.pgidx', which is discarded when the file size or mtime change.
+        """
+        if self.page_index:
+            return self.page_index
+
+        index = PageIndex(self.f)
+        sidecar = self.f.filename + ".pgidx"
+        if not (self.page_index_sidecar and index.load(sidecar)):
+            index.build()
+            if self.page_index_sidecar:
+                try:
+                    index.save(sidecar)
+                except OSError as e:
+                    print(f"Unable to save page index {sidecar}: {e}")
+
+        self.page_index = index
+        return index
+
     def list_tables(self):
         result = []
         for i in range(self.num_catalog):
@@ -70,6 +129,163 @@ class Mdb:
 
         return result
 
+    def format_settings(self):
+        # Value formatting settings, reapplied to the Mdb opened by export workers
+        return {"date_fmt": self.date_fmt, "shortdate_fmt": self.shortdate_fmt, "repid_fmt": self.repid_fmt,
+                "boolean_true_value": self.boolean_true_value, "boolean_false_value": self.boolean_false_value}
+
+    def apply_settings(self, settings):
+        for name, value in settings.items():
+            setattr(self, name, value)
+
+    def export_all(self, out_dir, jobs=None, **options):
+        """
+         * Exports every user table to '<out_dir>/<table>.csv', 'jobs' tables at
+         * a time in worker processes (os.cpu_count() when None, in this process
+         * when 1). The largest tables, by data page count, are started first.
+         * options are passed to Table.export.
+         *
+         * Returns a dict table name -> {"file", "rows", "seconds", "error"}.
+        """
+        os.makedirs(out_dir, exist_ok=True)
+
+        tables = []
+        for i in range(self.num_catalog):
+            entry: Catalog = self.catalog[i]
+            if entry.is_user_table():
+                pages = Table(entry).num_data_pages()
+                out_file = os.path.join(out_dir, safe_file_name(entry.object_name) + ".csv")
+                tables.append((pages, entry.object_name, out_file))
+        tables.sort(key=lambda t: -t[0])
+
+        settings = self.format_settings()
+        result = {}
+        if jobs == 1:
+            for pages, name, out_file in tables:
+                rows, seconds, error = export_table_worker(self.f.filename, self.options, name, out_file, options,
+                                                           settings=settings)
+                result[name] = {"file": out_file, "rows": rows, "seconds": seconds, "error": error}
+            return result
+
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = [(name, out_file, executor.submit(export_table_worker, self.f.filename, self.options, name,
+                                                         out_file, options, settings=settings))
+                       for pages, name, out_file in tables]
+            for name, out_file, future in futures:
+                try:
+                    rows, seconds, error = future.result()
+                except Exception as e:  # the worker process died
+                    rows, seconds, error = 0, 0.0, f"{type(e).__name__}: {e}"
+                result[name] = {"file": out_file, "rows": rows, "seconds": seconds, "error": error}
+
+        return result
+
+    def export_table_parallel(self, name, out_file, jobs=None, parts=None, part_files=False, blob_dir=None,
+                              **options):
+        """
+         * Exports one table splitting its data pages (in usage map order) into
+         * 'parts' contiguous ranges (default: jobs, or os.cpu_count()), each
+         * decoded by a worker process into its own part file.
+         *
+         * With part_files the numbered files '<out_file>.partNNNN' are kept,
+         * each with a header row; otherwise they are concatenated in page order
+         * into out_file and removed (parts after the first are then written
+         * without the encoding's BOM). OLE values of part N go to
+         * '<blob_dir>/partNNNN', as row numbers restart in every part.
+         * options are passed to Table.export.
+         *
+         * Returns {"file", "files", "rows", "seconds", "error", "parts"}, where
+         * parts holds the {"file", "pages", "rows", "seconds", "error"} of each range.
+        """
+        started = time.perf_counter()
+        table = self.read_table_by_name(name)
+        if not table:
+            print(f"Table {name} not found")
+            return None
+
+        num_pages = table.num_data_pages()
+        parts = max(1, min(parts or jobs or os.cpu_count() or 1, num_pages))
+        bounds = [num_pages * i // parts for i in range(parts + 1)]
+        header_row = options.pop("header_row", True)
+
+        tasks = []
+        for i in range(parts):
+            part_file = f"{out_file}.part{i:04d}"
+            part_options = dict(options, header_row=header_row and (part_files or i == 0))
+            if not part_files and i > 0 and "encoding" in options:
+                part_options["encoding"] = bom_free_encoding(options["encoding"])
+            if blob_dir:
+                part_options["blob_dir"] = os.path.join(blob_dir, f"part{i:04d}")
+            tasks.append((part_file, (bounds[i], bounds[i + 1]), part_options))
+
+        settings = self.format_settings()
+        results = []
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = [executor.submit(export_table_worker, self.f.filename, self.options, name, part_file,
+                                       part_options, page_range, settings)
+                       for part_file, page_range, part_options in tasks]
+            for (part_file, page_range, part_options), future in zip(tasks, futures):
+                try:
+                    rows, seconds, error = future.result()
+                except Exception as e:  # the worker process died
+                    rows, seconds, error = 0, 0.0, f"{type(e).__name__}: {e}"
+                results.append({"file": part_file, "pages": page_range, "rows": rows, "seconds": seconds,
+                                "error": error})
+
+        error = next((part["error"] for part in results if part["error"]), None)
+        files = [part["file"] for part in results]
+        if not part_files and not error:
+            with open(out_file, "wb") as out:
+                for part_file in files:
+                    with open(part_file, "rb") as part:
+                        shutil.copyfileobj(part, out, 1024 * 1024)
+                    os.remove(part_file)
+            files = [out_file]
+
+        return {"file": out_file, "files": files, "rows": sum(part["rows"] for part in results),
+                "seconds": time.perf_counter() - started, "error": error, "parts": results}
+
+    def export_sqlite(self, db_path, tables=None, indexes=None, batch_rows=10000, rows_per_transaction=500000):
+        """
+         * Loads tables (names, default every user table) into the SQLite
+         * database db_path, creating typed tables from the column definitions
+         * (see sqlite_export). The journal and fsyncs are off during the load,
+         * so db_path should be a new file.
+         *
+         * Jet index definitions aren't read; indexes maps a table name to a list
+         * of column name tuples, which are indexed once all rows are loaded.
+         *
+         * Returns a dict table name -> {"rows", "seconds", "error"}.
+        """
+        if tables is None:
+            tables = [self.catalog[i].object_name for i in range(self.num_catalog) if self.catalog[i].is_user_table()]
+        indexes = indexes or {}
+
+        result = {}
+        conn = sqlite3.connect(db_path, isolation_level=None)
+        try:
+            for pragma in BULK_LOAD_PRAGMAS:
+                conn.execute(pragma)
+
+            for name in tables:
+                started = time.perf_counter()
+                rows, error = 0, None
+                table = self.read_table_by_name(name)
+                if not table:
+                    error = f"Table {name} not found"
+                else:
+                    try:
+                        rows = load_table(conn, table, batch_rows, rows_per_transaction)
+                        for col_names in indexes.get(name, ()):
+                            conn.execute(create_index_sql(name, col_names))
+                    except Exception as e:  # decode errors too: the table is dropped, the others still load
+                        error = f"{type(e).__name__}: {e}"
+                result[name] = {"rows": rows, "seconds": time.perf_counter() - started, "error": error}
+        finally:
+            conn.close()
+
+        return result
+
     def read_catalog(self, objtype):
         msysobj = Catalog(self)
         msysobj.object_type = MDB_TABLE
@@ -0,0 +1,79 @@
+"""
+    mdb2csv - Exports tables from mdb file to csv file
+    Copyright (C) 2024  Aléxis Rodrigues de Almeida
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import threading
+from collections import OrderedDict
+
+
+class PageCache:
+    """
+     * Bounded LRU cache of page buffers keyed by page number.
+     * max_pages limits the number of cached pages and max_bytes the total
+     * size of the buffers; 0 means no limit for that dimension. A cache with
+     * both limits at 0 is disabled.
+    """
+    def __init__(self, max_pages=256, max_bytes=0):
+        self.max_pages = max_pages
+        self.max_bytes = max_bytes
+        self.pages = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def enabled(self):
+        return self.max_pages > 0 or self.max_bytes > 0
+
+    def __contains__(self, pg):
+        return pg in self.pages
+
+    def get(self, pg):
+        with self.lock:
+            buf = self.pages.get(pg)
+            if buf is None:
+                self.misses += 1
+                return None
+
+            self.pages.move_to_end(pg)
+            self.hits += 1
+            return buf
+
+    def put(self, pg, buf):
+        if not self.enabled():
+            return
+
+        with self.lock:
+            old = self.pages.pop(pg, None)
+            if old is not None:
+                self.size -= len(old)
+
+            self.pages[pg] = buf
+            self.size += len(buf)
+
+            while self.pages and ((self.max_pages and len(self.pages) > self.max_pages) or
+                                  (self.max_bytes and self.size > self.max_bytes)):
+                _, old = self.pages.popitem(last=False)
+                self.size -= len(old)
+
+    def clear(self):
+        with self.lock:
+            self.pages.clear()
+            self.size = 0
+
+    def stats(self):
+        return {"pages": len(self.pages), "bytes": self.size, "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,138 @@
+"""
+    mdb2csv - Exports tables from mdb file to csv file
+    Copyright (C) 2024  Aléxis Rodrigues de Almeida
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import os
+import struct
+from array import array
+
+from consts import MDB_PAGE_DATA
+
+PAGE_INDEX_MAGIC = b"MDBPGIX1"
+PAGE_INDEX_HEADER = struct.Struct("<8sQdII")  # magic, file size, mtime, page size, number of pages
+PAGE_INDEX_CHUNK = 256  # pages per read while scanning a stream
+
+
+class PageIndex:
+    """
+     * Page type and owner of every page in the file, built with a single
+     * sequential pass. Owners are only kept for data pages (the table
+     * definition page found at offset 4); other pages have owner 0.
+    """
+    def __init__(self, f):
+        self.f = f
+        self.num_pages = 0
+        self.types = bytearray()
+        self.owners = array("I")
+
+    def build(self):
+        f = self.f
+        pg_size = f.pg_size
+        file_size = self.file_size()
+        self.num_pages = file_size // pg_size
+        self.types = bytearray(self.num_pages)
+        self.owners = array("I", bytes(4 * self.num_pages))
+
+        pg = 0
+        while pg < self.num_pages:
+            count = min(PAGE_INDEX_CHUNK, self.num_pages - pg)
+            if f.map is not None:
+                raw = f.map[pg * pg_size: (pg + count) * pg_size]
+            else:
+                with f.lock:
+                    f.stream.seek(pg * pg_size)
+                    raw = memoryview(f.stream.read(count * pg_size))
+
+            for i in range(count):
+                # the RC4 keystream starts at the page start, so the header alone can be decoded
+                header = raw[i * pg_size: i * pg_size + 8]
+                if f.db_key:
+                    header = f.decrypt_pg(pg + i, header)
+                self.types[pg + i] = header[0]
+                if header[0] == MDB_PAGE_DATA:
+                    self.owners[pg + i] = struct.unpack_from("<I", header, 4)[0]
+            pg += count
+
+        return self
+
+    def file_size(self):
+        if self.f.map is not None:
+            return len(self.f.map)
+        return os.fstat(self.f.stream.fileno()).st_size
+
+    def next_data_pg(self, table_pg, start_pg):
+        """
+         * Returns the first data page after start_pg owned by table_pg,
+         * or 0 if there is none.
+        """
+        pg = self.types.find(MDB_PAGE_DATA, start_pg + 1)
+        while pg != -1:
+            if self.owners[pg] == table_pg:
+                return pg
+            pg = self.types.find(MDB_PAGE_DATA, pg + 1)
+
+        return 0
+
+    def data_pages(self, table_pg):
+        pages = array("I")
+        pg = self.next_data_pg(table_pg, 0)
+        while pg:
+            pages.append(pg)
+            pg = self.next_data_pg(table_pg, pg)
+
+        return pages
+
+    def sidecar_key(self):
+        st = os.stat(self.f.filename)
+        return st.st_size, st.st_mtime
+
+    def save(self, path):
+        size, mtime = self.sidecar_key()
+        with open(path, "wb") as out:
+            out.write(PAGE_INDEX_HEADER.pack(PAGE_INDEX_MAGIC, size, mtime, self.f.pg_size, self.num_pages))
+            out.write(self.types)
+            out.write(self.owners.tobytes())
+
+    def load(self, path):
+        """
+         * Loads a sidecar written by save(). Returns None when it is missing
+         * or was built for a different version of the file.
+        """
+        if not os.path.exists(path):
+            return None
+
+        size, mtime = self.sidecar_key()
+        with open(path, "rb") as inp:
+            header = inp.read(PAGE_INDEX_HEADER.size)
+            if len(header) != PAGE_INDEX_HEADER.size:
+                return None
+
+            magic, s_size, s_mtime, pg_size, num_pages = PAGE_INDEX_HEADER.unpack(header)
+            if magic != PAGE_INDEX_MAGIC or s_size != size or s_mtime != mtime or pg_size != self.f.pg_size:
+                return None
+
+            types = bytearray(inp.read(num_pages))
+            owner_bytes = inp.read(4 * num_pages)
+            if len(types) != num_pages or len(owner_bytes) != 4 * num_pages:
+                return None  # truncated
+            owners = array("I")
+            owners.frombytes(owner_bytes)
+
+        self.num_pages = num_pages
+        self.types = types
+        self.owners = owners
+        return self
@@ -0,0 +1,187 @@
+"""
+    mdb2csv - Exports tables from mdb file to csv file
+    Copyright (C) 2024  Aléxis Rodrigues de Almeida
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import struct
+from datetime import datetime, timedelta
+
+from consts import (MDB_BOOL, MDB_BYTE, MDB_INT, MDB_LONGINT, MDB_COMPLEX, MDB_FLOAT, MDB_DOUBLE, MDB_DATETIME,
+                    MDB_MONEY, MDB_TEXT, MDB_MEMO, MDB_NUMERIC, MDB_REPID)
+
+# PostgreSQL binary COPY: signature, flags, header extension length; every tuple
+# is a field count then (length, data) per field, -1 length for nulls
+PGCOPY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack(">ii", 0, 0)
+PGCOPY_TRAILER = struct.pack(">h", -1)
+
+PG_INT16 = struct.Struct(">h")
+PG_INT32 = struct.Struct(">i")
+PG_INT64 = struct.Struct(">q")
+PG_FLOAT4 = struct.Struct(">f")
+PG_FLOAT8 = struct.Struct(">d")
+PG_NUMERIC_HEADER = struct.Struct(">hhHh")  # ndigits, weight, sign, dscale
+PG_NULL = PG_INT32.pack(-1)
+
+PG_EPOCH = datetime(2000, 1, 1)
+PG_NUMERIC_NEG = 0x4000
+
+
+def pg_type(col):
+    col_type = col.col_type
+
+    if col_type == MDB_BOOL:
+        return "boolean"
+    elif col_type in (MDB_BYTE, MDB_INT):
+        return "int2"
+    elif col_type in (MDB_LONGINT, MDB_COMPLEX):
+        return "int4"
+    elif col_type == MDB_FLOAT:
+        return "float4"
+    elif col_type == MDB_DOUBLE:
+        return "float8"
+    elif col_type == MDB_DATETIME:
+        return "timestamp"
+    elif col_type == MDB_MONEY:
+        return "numeric(19,4)"
+    elif col_type == MDB_NUMERIC:
+        return f"numeric({max(col.col_prec, col.col_scale, 1)},{col.col_scale})"
+    elif col_type in (MDB_TEXT, MDB_MEMO, MDB_REPID):
+        return "text"
+
+    return "bytea"
+
+
+def create_table_sql(table, name=None):
+    # CREATE TABLE statement matching the columns written by PgCopyWriter
+    def quote(ident):
+        return '"' + ident.replace('"', '""') + '"'
+
+    cols = ", ".join(f"{quote(col.name)} {pg_type(col)}" for col in table.columns)
+    return f"CREATE TABLE {quote(name or table.name)} ({cols})"
+
+
+def encode_numeric(value):
+    # numeric send format of a Decimal: base 10000 digits, most significant first
+    sign, digits, exp = value.as_tuple()
+    dscale = max(-exp, 0)
+    n = int("".join(map(str, digits)) or "0")
+
+    # align the exponent to a multiple of 4 so n splits in base 10000 digits
+    shift = exp % 4
+    n *= 10 ** shift
+    exp -= shift
+
+    groups = []
+    while n:
+        groups.append(n % 10000)
+        n //= 10000
+    groups.reverse()
+    weight = len(groups) - 1 + exp // 4
+
+    while groups and groups[-1] == 0:
+        groups.pop()
+    if not groups:
+        weight = 0
+
+    return (PG_NUMERIC_HEADER.pack(len(groups), weight, PG_NUMERIC_NEG if sign else 0, dscale) +
+            struct.pack(f">{len(groups)}h", *groups))
+
+
+def encode_timestamp(value):
+    return PG_INT64.pack((value - PG_EPOCH) // timedelta(microseconds=1))
+
+
+def encode_bytes(value):
+    return value.encode("utf-8") if isinstance(value, str) else bytes(value)
+
+
+def pg_encoder(col):
+    """
+     * Function encoding a non null typed value (Column.to_value) of the
+     * column in the binary send format of pg_type(col).
+    """
+    col_type = col.col_type
+
+    if col_type == MDB_BOOL:
+        return lambda value: b"\x01" if value else b"\x00"
+    elif col_type in (MDB_BYTE, MDB_INT):
+        return PG_INT16.pack
+    elif col_type in (MDB_LONGINT, MDB_COMPLEX):
+        return PG_INT32.pack
+    elif col_type == MDB_FLOAT:
+        return PG_FLOAT4.pack
+    elif col_type == MDB_DOUBLE:
+        return PG_FLOAT8.pack
+    elif col_type == MDB_DATETIME:
+        return encode_timestamp
+    elif col_type in (MDB_MONEY, MDB_NUMERIC):
+        return encode_numeric
+    elif col_type in (MDB_TEXT, MDB_MEMO, MDB_REPID):
+        return lambda value: value.encode("utf-8")
+
+    return encode_bytes
+
+
+class PgCopyWriter:
+    """
+     * Writes rows of typed values in PostgreSQL's binary COPY format, for
+     * COPY ... FROM ... WITH (FORMAT binary) into a table created with
+     * create_table_sql. out_file is a path or a binary stream (a pipe to
+     * psql, a socket file, ...), which is flushed but not closed.
+    """
+    def __init__(self, out_file, columns, buffer_size=1024 * 1024, rows_per_write=1000):
+        self.encoders = [pg_encoder(col) for col in columns]
+        self.field_count = PG_INT16.pack(len(columns))
+        self.rows_per_write = rows_per_write
+        self.rows = []
+        if isinstance(out_file, (str, bytes)) or hasattr(out_file, "__fspath__"):
+            self.stream = open(out_file, "wb", buffering=buffer_size)
+            self.owns_stream = True
+        else:
+            self.stream = out_file
+            self.owns_stream = False
+
+        self.stream.write(PGCOPY_HEADER)
+
+    def format_row(self, values):
+        parts = [self.field_count]
+        for encode, value in zip(self.encoders, values):
+            if value is None:
+                parts.append(PG_NULL)
+            else:
+                data = encode(value)
+                parts.append(PG_INT32.pack(len(data)))
+                parts.append(data)
+
+        return b"".join(parts)
+
+    def write_row(self, values):
+        self.rows.append(self.format_row(values))
+        if len(self.rows) >= self.rows_per_write:
+            self.flush()
+
+    def flush(self):
+        if self.rows:
+            self.stream.write(b"".join(self.rows))
+            self.rows = []
+
+    def close(self):
+        self.flush()
+        self.stream.write(PGCOPY_TRAILER)
+        if self.owns_stream:
+            self.stream.close()
+        else:
+            self.stream.flush()
@@ -0,0 +1,82 @@
+"""
+    mdb2csv - Exports tables from mdb file to csv file
+    Copyright (C) 2024  Aléxis Rodrigues de Almeida
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+
+class ReadAhead:
+    """
+     * Loads upcoming data pages on background threads while the current
+     * page is being decoded. Loaded pages land in the file's page cache, so
+     * the cache must hold at least 'window' pages for this to pay off.
+    """
+    def __init__(self, f, window=8, threads=1):
+        self.f = f
+        self.window = window
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="mdb-readahead")
+        self.pending = {}  # first page of the run -> (count, Future)
+        self.last_pg = 0
+
+    def schedule(self, pages):
+        """
+         * Queues the pages from 'pages' (ascending page numbers) until the
+         * window is full. Consecutive pages are grouped in a single read.
+        """
+        run_start = run_len = 0
+        queued = sum(count for count, _ in self.pending.values())
+
+        for pg in pages:
+            if queued >= self.window:
+                break
+            if pg <= self.last_pg:
+                continue
+            self.last_pg = pg
+            if pg in self.f.cache:
+                continue
+
+            if run_len and pg == run_start + run_len:
+                run_len += 1
+            else:
+                self.submit(run_start, run_len)
+                run_start, run_len = pg, 1
+            queued += 1
+
+        self.submit(run_start, run_len)
+
+    def submit(self, first_pg, count):
+        if count:
+            self.pending[first_pg] = (count, self.executor.submit(self.f.load_pg_run, first_pg, count))
+
+    def wait(self, pg):
+        # Blocks until a pending read covering page pg (if any) has finished
+        for first_pg in list(self.pending):
+            count, future = self.pending[first_pg]
+            if first_pg <= pg < first_pg + count:
+                future.result()
+            if first_pg <= pg:
+                del self.pending[first_pg]
+
+    def reset(self):
+        for count, future in self.pending.values():
+            future.cancel()
+        self.pending = {}
+        self.last_pg = 0
+
+    def close(self):
+        self.reset()
+        self.executor.shutdown(wait=True)
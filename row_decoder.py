@@ -0,0 +1,149 @@
+"""
+    mdb2csv - Exports tables from mdb file to csv file
+    Copyright (C) 2024  Aléxis Rodrigues de Almeida
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+from consts import MDB_VER_JET3
+from utils import get_int16, get_int16_array
+
+
+class RowDecoder:
+    """
+     * Row cracker specialized for one table. Everything that only depends
+     * on the column definitions (null mask byte/bit, fixed offsets, variable
+     * column slots) is computed once, so decoding a row is a single pass
+     * over a precomputed plan.
+     *
+     * The decoded row is kept in the parallel lists starts/sizes/nulls (one
+     * entry per column), which are reused from one row to the next.
+    """
+    def __init__(self, table):
+        f = table.mdb.f
+        self.table = table
+        self.pg_size = f.pg_size
+        self.is_jet3 = (f.jet_version == MDB_VER_JET3)
+        self.col_count_size = 1 if self.is_jet3 else 2
+        self.num_var_cols = table.num_var_cols
+
+        # (null mask byte, null mask bit, is_fixed, start of fixed data in the row, size, var_col_num)
+        self.plan = tuple((col.col_num // 8, 1 << (col.col_num % 8), col.is_fixed,
+                           col.fixed_offset + self.col_count_size, col.col_size, col.var_col_num)
+                          for col in table.columns)
+
+        num_cols = len(self.plan)
+        self.starts = [0] * num_cols
+        self.sizes = [0] * num_cols
+        self.nulls = [1] * num_cols
+
+    def decode(self, buf, row_start, row_size):
+        """
+         * Cracks the row at row_start of the page in buf into starts/sizes/nulls,
+         * starts being offsets in buf.
+         * Returns the number of columns stored in the row, or -1 when the row
+         * is invalid.
+        """
+        row_end = row_start + row_size - 1
+        is_jet3 = self.is_jet3
+
+        row_cols = buf[row_start] if is_jet3 else get_int16(buf, row_start)
+
+        bitmask_sz = (row_cols + 7) // 8
+        if (bitmask_sz + (0 if is_jet3 else 1)) >= row_end:
+            return -1
+
+        nullmask = row_end - bitmask_sz + 1
+
+        # read table of variable column locations
+        row_var_cols = 0
+        var_col_offsets = None
+        if self.num_var_cols > 0:
+            if is_jet3:
+                row_var_cols = buf[row_end - bitmask_sz]
+                var_col_offsets = self.var_col_offsets3(buf, row_start, row_end, bitmask_sz, row_var_cols)
+            else:
+                row_var_cols = get_int16(buf, row_end - bitmask_sz - 1)
+                var_col_offsets = self.var_col_offsets4(buf, row_end, bitmask_sz, row_var_cols)
+
+            if var_col_offsets is None:
+                return -1
+
+        fixed_cols_found = 0
+        row_fixed_cols = row_cols - row_var_cols
+        row_limit = row_start + row_size
+        starts = self.starts
+        sizes = self.sizes
+        nulls = self.nulls
+
+        for i, (byte_num, bit_mask, is_fixed, fixed_start, col_size, var_col_num) in enumerate(self.plan):
+            # logic on nulls is reverse, 1 is not null, 0 is null
+            is_null = 0 if byte_num < bitmask_sz and buf[nullmask + byte_num] & bit_mask else 1
+
+            if is_fixed and fixed_cols_found < row_fixed_cols:
+                start = row_start + fixed_start
+                size = col_size
+                fixed_cols_found += 1
+                # Use var_col_num because a deleted column is still
+                # present in the variable column offsets table for the row
+            elif not is_fixed and var_col_num < row_var_cols:
+                col_start = var_col_offsets[var_col_num]
+                start = row_start + col_start
+                size = var_col_offsets[var_col_num + 1] - col_start
+            else:
+                start = size = 0
+                is_null = 1
+
+            if start + size > row_limit:
+                print(f"warning: Invalid data location detected in mdb_crack_row. Table:{self.table.name} Column:{i}")
+                return -1
+
+            starts[i] = start
+            sizes[i] = size
+            nulls[i] = is_null
+
+        return row_cols
+
+    def var_col_offsets3(self, buf, row_start, row_end, bitmask_sz, row_var_cols):
+        row_len = row_end - row_start + 1
+        num_jumps = (row_len - 1) // 256
+        col_ptr = row_end - bitmask_sz - num_jumps - 1
+
+        # If last jump is a dummy value, ignore it
+        if (col_ptr - row_start - row_var_cols) // 256 < num_jumps:
+            num_jumps -= 1
+
+        if (bitmask_sz + num_jumps + 1) > row_end:
+            return None
+
+        if col_ptr >= self.pg_size or col_ptr < row_var_cols:
+            return None
+
+        var_col_offsets = []
+        jumps_used = 0
+        for i in range(row_var_cols + 1):
+            while (jumps_used < num_jumps) and i == buf[row_end - bitmask_sz - jumps_used - 1]:
+                jumps_used += 1
+
+            var_col_offsets.append(buf[col_ptr - i] + (jumps_used * 256))
+
+        return var_col_offsets
+
+    @staticmethod
+    def var_col_offsets4(buf, row_end, bitmask_sz, row_var_cols):
+        if bitmask_sz + 3 + row_var_cols * 2 + 2 > row_end:
+            return None
+
+        # the offset table is stored backwards, ending just before the variable column count
+        return get_int16_array(buf, row_end - bitmask_sz - 3 - (row_var_cols * 2), row_var_cols + 1)[::-1]
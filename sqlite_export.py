@@ -0,0 +1,115 @@
+"""
+    mdb2csv - Exports tables from mdb file to csv file
+    Copyright (C) 2024  Aléxis Rodrigues de Almeida
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+from consts import (MDB_BOOL, MDB_BYTE, MDB_INT, MDB_LONGINT, MDB_COMPLEX, MDB_FLOAT, MDB_DOUBLE, MDB_DATETIME,
+                    MDB_MONEY, MDB_TEXT, MDB_MEMO, MDB_NUMERIC, MDB_REPID)
+
+# Pragmas for loading into a new file: no rollback journal and no fsync until the end
+BULK_LOAD_PRAGMAS = ("PRAGMA journal_mode = OFF", "PRAGMA synchronous = OFF", "PRAGMA temp_store = MEMORY",
+                     "PRAGMA cache_size = -65536")
+
+
+def quote_name(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def sqlite_type(col):
+    col_type = col.col_type
+
+    if col_type in (MDB_BOOL, MDB_BYTE, MDB_INT, MDB_LONGINT, MDB_COMPLEX):
+        return "INTEGER"
+    elif col_type in (MDB_FLOAT, MDB_DOUBLE):
+        return "REAL"
+    elif col_type in (MDB_MONEY, MDB_NUMERIC):
+        return "NUMERIC"
+    elif col_type in (MDB_TEXT, MDB_MEMO, MDB_REPID, MDB_DATETIME):
+        return "TEXT"
+
+    return "BLOB"
+
+
+def sqlite_converter(col):
+    """
+     * Function converting a typed value (Column.to_value) of the column to
+     * one sqlite3 binds, or None when it binds as is. Datetimes are stored as
+     * 'YYYY-MM-DD HH:MM:SS' and Decimals as their exact decimal text.
+    """
+    if col.col_type == MDB_DATETIME:
+        return lambda value: None if value is None else value.isoformat(" ")
+    elif col.col_type in (MDB_MONEY, MDB_NUMERIC):
+        return lambda value: None if value is None else format(value, "f")
+
+    return None
+
+
+def create_table_sql(table):
+    cols = ", ".join(f"{quote_name(col.name)} {sqlite_type(col)}" for col in table.columns)
+    return f"CREATE TABLE {quote_name(table.name)} ({cols})"
+
+
+def create_index_sql(table_name, col_names):
+    index_name = f"{table_name}_{'_'.join(col_names)}_idx"
+    cols = ", ".join(quote_name(name) for name in col_names)
+    return f"CREATE INDEX {quote_name(index_name)} ON {quote_name(table_name)} ({cols})"
+
+
+def load_table(conn, table, batch_rows=10000, rows_per_transaction=500000):
+    """
+     * (Re)creates the table in the sqlite3 connection and loads its rows
+     * with executemany, batch_rows at a time, committing every
+     * rows_per_transaction rows. The connection must be in autocommit mode
+     * (isolation_level None). On errors the table is dropped and the error
+     * raised again. Returns the number of rows loaded.
+    """
+    if not table.columns:
+        table.read_columns()
+
+    converters = [(i, conv) for i, conv in enumerate(sqlite_converter(col) for col in table.columns) if conv]
+    insert = (f"INSERT INTO {quote_name(table.name)} VALUES "
+              f"({', '.join('?' * len(table.columns))})")
+
+    conn.execute(f"DROP TABLE IF EXISTS {quote_name(table.name)}")
+    conn.execute(create_table_sql(table))
+
+    rows = 0
+    in_transaction = 0
+    conn.execute("BEGIN")
+    try:
+        for batch in table.iter_batches(batch_rows, typed=True):
+            if converters:
+                for j, row in enumerate(batch):
+                    row = list(row)
+                    for i, conv in converters:
+                        row[i] = conv(row[i])
+                    batch[j] = row
+            conn.executemany(insert, batch)
+            rows += len(batch)
+            in_transaction += len(batch)
+            if in_transaction >= rows_per_transaction:
+                conn.execute("COMMIT")
+                conn.execute("BEGIN")
+                in_transaction = 0
+        conn.execute("COMMIT")
+    except BaseException:
+        # ROLLBACK is undefined with journal_mode OFF: drop the partial table instead
+        if conn.in_transaction:
+            conn.execute("COMMIT")
+        conn.execute(f"DROP TABLE IF EXISTS {quote_name(table.name)}")
+        raise
+
+    return rows
@@ -16,12 +16,22 @@
     along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
 
+from collections import namedtuple
+
+from arrow_batch import require_pyarrow, arrow_schema, to_record_batch, write_parquet
+from batch import Batch
 from bind import Bind
+from blob import BlobExporter
 from column import Column
+from csv_writer import CsvWriter
 from consts import MDB_NUMERIC, MDB_MONEY, MDB_FLOAT, MDB_DOUBLE, MDB_BOOL, MDB_VER_JET3, MDB_INDEX_SCAN, MDB_OLE, \
-    MDB_BINARY, MDB_REPID, MDB_PAGE_DATA, OFFSET_MASK, MDB_NOT, MDB_AND, MDB_OR, MDB_ISNULL, MDB_NOTNULL, MDB_BYTE, \
+    MDB_REPID, MDB_PAGE_DATA, OFFSET_MASK, MDB_NOT, MDB_AND, MDB_OR, MDB_ISNULL, MDB_NOTNULL, MDB_BYTE, \
     MDB_INT, MDB_LONGINT, MDB_TEXT, MDB_MEMO, MDB_DATETIME
 from field import Field
+from lval import LvalResolver
+from pg_copy import PgCopyWriter
+from read_ahead import ReadAhead
+from row_decoder import RowDecoder
 from utils import get_byte, get_int16, get_int32, is_relational_op, get_single, get_double, test_int, test_double, \
     test_string
 
@@ -35,6 +45,7 @@ class Table:
 
         self.num_cols = 0
         self.columns = []       # [MdbColumn]
+        self.decoder = None     # RowDecoder, built from the columns on first use
         self.num_rows = 0
         self.index_start = 0
         self.num_real_idxs = 0
@@ -43,7 +54,10 @@ class Table:
         self.first_data_pg = 0
         self.cur_pg_num = 0
         self.cur_phys_pg = 0
+        self.cur_dpg_idx = 0
+        self.data_pages = None  # array of data page numbers decoded from the usage map
         self.cur_row = 0
+        self.row_num = -1       # number of the last row read since rewind_table()
         self.noskip_del = 0
         self.map_base_pg = 0
         self.map_sz = 0
@@ -61,6 +75,12 @@ class Table:
         self.is_temp_table = 0
         self.temp_table_pages = []
         self.outfile = None
+        self.read_ahead = None  # ReadAhead
+        self.blob_exporter = None  # BlobExporter for MDB_OLE columns
+        self.text_cache_size = 0
+        self.text_cache_cols = None  # names of the columns using the text cache, None for all
+        self.page_memos = None  # (row, col_num) -> memo value of the current data page, see prefetch_memos
+        self.page_rows = None  # (starts, sizes, nulls) of each row of the current data page, see prefetch_memos
 
         self.read_table()
 
@@ -120,57 +140,184 @@ class Table:
                 if not props.name:
                     self.props = props
 
-    def export(self, out_file):
-        arqs = open(out_file, "w")
-        self.outfile = arqs
-        delimiter = ";"
-        row_delimiter = "\n"
-        header_row = True
-        null_text = ""
-        quote_text = ""
-
-        self.read_columns()
-        self.rewind_table()
-
-        bound_values = []
-        for i in range(self.num_cols):
-            col = self.columns[i]
-            col.bind_ptr = Bind(col.name)
-            bound_values.append(col.bind_ptr)
-
-        if header_row:
+    def set_blob_exporter(self, exporter):
+        """
+         * Streams the values of MDB_OLE columns through a BlobExporter while
+         * reading rows; the bound value becomes the exporter's reference.
+         * None (the default) exports OLE columns as empty values.
+        """
+        self.blob_exporter = exporter
+
+    def export(self, out_file, blob_dir=None, header_row=True, **options):
+        """
+         * Exports the table to out_file. options are passed to CsvWriter
+         * (delimiter, quoting, encoding, buffer_size, bin_mode, ...).
+         * Columns are bound typed and only formatted by the writer.
+         * Returns the number of rows written.
+        """
+        # the blob exporter only lasts for this export
+        previous_exporter = self.blob_exporter
+        if blob_dir:
+            self.set_blob_exporter(BlobExporter(blob_dir))
+
+        try:
+            # read_columns parses the table definition page, which is no longer loaded after a scan
+            if not self.columns:
+                self.read_columns()
+            self.rewind_table()
+
+            mdb = self.mdb
+            options.setdefault("date_fmt", mdb.date_fmt)
+            options.setdefault("true_text", mdb.boolean_true_value)
+            options.setdefault("false_text", mdb.boolean_false_value)
+            options.setdefault("single_columns", [i for i, col in enumerate(self.columns) if col.col_type == MDB_FLOAT])
+            writer = CsvWriter(out_file, **options)
+            self.outfile = writer
+
+            bound_values = []
             for i in range(self.num_cols):
                 col = self.columns[i]
-                if i:
-                    arqs.write(delimiter)
-                arqs.write(col.name)
+                # OLE values are only written through the blob exporter, never loaded in memory
+                col.bind_ptr = Bind(col.name, typed=col.col_type != MDB_OLE)
+                bound_values.append(col.bind_ptr)
+
+            if header_row:
+                writer.write_header([col.name for col in self.columns])
+
+            # OLE binds hold "" for nulls and when there is no blob exporter
+            ole_cols = [i for i, col in enumerate(self.columns) if col.col_type == MDB_OLE]
+
+            linhas = 0
+            while self.fetch_row():
+                values = [bind.col_value for bind in bound_values]
+                for i in ole_cols:
+                    values[i] = values[i] or None
+                writer.write_row(values)
+                linhas += 1
+
+            writer.close()
+            self.outfile = None
+            print(linhas)
+            return linhas
+        finally:
+            self.blob_exporter = previous_exporter
+
+    def export_pgcopy(self, out_file, blob_dir=None, **options):
+        """
+         * Exports the table in PostgreSQL binary COPY format (see pg_copy) to
+         * out_file, a path or a binary stream. options are passed to
+         * PgCopyWriter. OLE values are written as bytea, or as the BlobExporter
+         * reference with blob_dir. Returns the number of rows written.
+        """
+        # the blob exporter only lasts for this export
+        previous_exporter = self.blob_exporter
+        if blob_dir:
+            self.set_blob_exporter(BlobExporter(blob_dir))
+
+        try:
+            if not self.columns:
+                self.read_columns()
+
+            writer = PgCopyWriter(out_file, self.columns, **options)
+            rows = 0
+            for row in self.iter_rows(typed=True):
+                writer.write_row(row)
+                rows += 1
+
+            writer.close()
+            return rows
+        finally:
+            self.blob_exporter = previous_exporter
+
+    def iter_record_batches(self, max_pages=16, use_numpy=False, dictionary=True):
+        """
+         * Generator over Arrow RecordBatches of the table, each holding the rows
+         * of up to max_pages data pages (see fetch_batch), with the schema of
+         * arrow_batch.arrow_schema. pyarrow must be installed.
+        """
+        require_pyarrow()
+        if not self.columns:
+            self.read_columns()
 
-            arqs.write(row_delimiter)
+        schema = arrow_schema(self.columns, dictionary)
+        self.rewind_table()
+        while True:
+            batch = self.fetch_batch(max_pages, use_numpy)
+            if batch is None:
+                break
+            if batch.num_rows:
+                yield to_record_batch(batch, schema)
+
+    def export_parquet(self, path, row_group_size=1024 * 1024, max_pages=16, use_numpy=False, dictionary=True,
+                       **options):
+        """
+         * Exports the table to a Parquet file, streaming row groups of
+         * row_group_size rows. options are passed to pyarrow's ParquetWriter.
+         * Returns the number of rows written.
+        """
+        require_pyarrow()
+        if not self.columns:
+            self.read_columns()
+
+        return write_parquet(path, arrow_schema(self.columns, dictionary),
+                             self.iter_record_batches(max_pages, use_numpy, dictionary), row_group_size, **options)
+
+    def iter_rows(self, columns=None, named=False, typed=False):
+        """
+         * Generator over the rows of the table, read one data page at a time
+         * from the start of the table. Yields tuples of the bound values of
+         * 'columns' (names, default all) or, with named, namedtuples (names
+         * that aren't identifiers are renamed _0, _1, ...). With typed the
+         * values are native (see Column.to_value) instead of strings.
+         *
+         * Scans share the table's cursor: don't interleave two of them, or
+         * fetch_row(), on the same Table.
+        """
+        if not self.columns:
+            self.read_columns()
+
+        names = columns or [col.name for col in self.columns]
+        by_name = {col.name: col for col in self.columns}
+        for name in names:
+            if name not in by_name:
+                raise KeyError(f"Column {name} not found in table {self.name}")
+
+        # only bound columns are converted by read_row
+        for col in self.columns:
+            col.bind_ptr = None
+        binds = []
+        for name in names:
+            col = by_name[name]
+            if not col.bind_ptr:
+                col.bind_ptr = Bind(col.name, typed)
+            binds.append(col.bind_ptr)
+
+        row_type = namedtuple("Row", names, rename=True) if named else None
 
-        linhas = 0
+        self.rewind_table()
         while self.fetch_row():
-            for i in range(self.num_cols):
-                if i > 0:
-                    arqs.write(delimiter)
-
-                col = self.columns[i]
-                if len(bound_values[i].col_value) == 0:
-                    arqs.write(null_text)
-                else:
-                    value = bound_values[i].col_value
-
-                    self.print_col(value, quote_text, col.col_type)
-
-            arqs.write(row_delimiter)
-            linhas += 1
-
-        arqs.close()
-        print(linhas)
+            values = tuple([bind.col_value for bind in binds])
+            yield row_type._make(values) if row_type else values
+
+    def iter_batches(self, size, columns=None, named=False, typed=False):
+        """
+         * Generator over lists of up to 'size' rows, as yielded by iter_rows.
+        """
+        batch = []
+        for row in self.iter_rows(columns, named, typed):
+            batch.append(row)
+            if len(batch) >= size:
+                yield batch
+                batch = []
+
+        if batch:
+            yield batch
 
     def read_columns(self):
         mdb = self.mdb
 
         self.columns = []
+        self.decoder = None
 
         cur_pos = mdb.f.tab_cols_start_offset + (self.num_real_idxs * mdb.f.tab_ridx_entry_size)
 
@@ -217,7 +364,7 @@ class Table:
 
             nome_uni, cur_pos = mdb.f.read_pg_if_n(cur_pos, name_sz)
             if cur_pos > 0:
-                pcol.name = mdb.f.unicode2ascii(bytes(nome_uni))
+                pcol.name = mdb.f.unicode2ascii(nome_uni)
 
         # Sort the columns by col_num
         # g_ptr_array_sort(table->columns, (GCompareFunc)mdb_col_comparer);
@@ -231,9 +378,24 @@ class Table:
                     if props.name and props.name == pcol.name:
                         pcol.props = props
                         break
+        self.set_text_cache(self.text_cache_size, self.text_cache_cols)
+
         self.index_start = cur_pos
         return self.columns
 
+    def set_text_cache(self, size, col_names=None):
+        """
+         * Enables a decoded string cache of 'size' values on the MDB_TEXT
+         * columns named in col_names (all of them when None). See
+         * Column.set_text_cache. Kept across read_columns() calls.
+        """
+        self.text_cache_size = size
+        self.text_cache_cols = col_names
+
+        for col in self.columns:
+            if col.col_type == MDB_TEXT and (col_names is None or col.name in col_names):
+                col.set_text_cache(size)
+
     def bind_column_by_name(self, col_bind: Bind):
         if not self.columns:
             return -1
@@ -253,7 +415,51 @@ class Table:
     def rewind_table(self):
         self.cur_pg_num = 0
         self.cur_phys_pg = 0
+        self.cur_dpg_idx = 0
         self.cur_row = 0
+        self.row_num = -1
+        self.page_memos = None
+        self.page_rows = None
+        if self.read_ahead:
+            self.read_ahead.reset()
+
+    def set_read_ahead(self, window, threads=1):
+        """
+         * Enables loading the next 'window' data pages on 'threads' background
+         * threads during table scans. A window of 0 disables read-ahead.
+        """
+        if self.read_ahead:
+            self.read_ahead.close()
+            self.read_ahead = None
+
+        if window > 0:
+            self.read_ahead = ReadAhead(self.mdb.f, window, threads)
+
+    def get_data_pages(self):
+        """
+         * Returns the sorted array of data pages of the table, decoded once
+         * from the usage map. If the map can't be decoded the pages owned by
+         * the table are taken from the file's page index instead.
+        """
+        if self.data_pages is None:
+            pages = self.mdb.f.map_pages(self.usage_map, self.map_sz)
+            if pages is None:
+                print("Warning: defaulting to brute force read")
+                pages = self.mdb.get_page_index().data_pages(self.entry.table_pg)
+            self.data_pages = pages
+
+        return self.data_pages
+
+    def num_data_pages(self):
+        return len(self.get_data_pages())
+
+    def set_page_range(self, start, stop):
+        """
+         * Restricts table scans to the data pages get_data_pages()[start:stop],
+         * so contiguous ranges of a table can be read independently.
+        """
+        self.data_pages = self.get_data_pages()[start:stop]
+        self.rewind_table()
 
     def fetch_row(self):
         mdb = self.mdb
@@ -264,6 +470,7 @@ class Table:
             if (not self.is_temp_table) and (self.strategy != MDB_INDEX_SCAN):
                 if not self.read_next_dpg():
                     return 0
+                self.prefetch_memos()
 
         while True:
             if self.is_temp_table:
@@ -294,6 +501,7 @@ class Table:
 
                     if not self.read_next_dpg():
                         return 0
+                    self.prefetch_memos()
 
             rc = self.read_row(self.cur_row)
             self.cur_row += 1
@@ -302,35 +510,52 @@ class Table:
 
         return 1
 
-    def print_col(self, col_val, quote_text, col_type):
-        is_binary_type = col_type in [MDB_OLE, MDB_BINARY, MDB_REPID]
-
-        if quote_text:
-            self.outfile.write(quote_text)
-
-        for c in col_val:
-            if is_binary_type:
-                self.outfile.write(f"{c}X")
-            else:
-                self.outfile.write(c)
+    def prefetch_memos(self):
+        """
+         * Fetches the memo values of the bound MDB_MEMO columns of every row of
+         * the current data page together, in one page-sorted LvalResolver
+         * pass, instead of one LVAL lookup per value while the rows are bound.
+         * The rows cracked on the way are kept in page_rows, so read_row
+         * doesn't decode them a second time.
+        """
+        self.page_memos = None
+        self.page_rows = None
+        memo_cols = [i for i, col in enumerate(self.columns) if col.col_type == MDB_MEMO and col.bind_ptr]
+        if not memo_cols:
+            return
 
-        if quote_text:
-            self.outfile.write(quote_text)
+        mdb = self.mdb
+        pg_buf = mdb.f.pg_buf
+        decoder = self.get_decoder()
+        resolver = LvalResolver(mdb.f)
+        keys = []
+        page_rows = []
+        for row in range(get_int16(pg_buf, mdb.f.row_count_offset)):
+            if not self.decode_row(row):
+                page_rows.append(None)
+                continue
+            page_rows.append((decoder.starts[:], decoder.sizes[:], decoder.nulls[:]))
+            for i in memo_cols:
+                if not decoder.nulls[i] and decoder.sizes[i]:
+                    key = resolver.add(pg_buf, decoder.starts[i], decoder.sizes[i])
+                    keys.append((row, self.columns[i].col_num, key))
+
+        values = resolver.resolve()
+        self.page_memos = {(row, col_num): values[key] for row, col_num, key in keys}
+        self.page_rows = page_rows
 
     def read_next_dpg(self):
         # Read next data page into mdb.pg_buf
         entry = self.entry
         mdb = entry.mdb
+        pages = self.get_data_pages()
 
-        while True:
-            next_pg = mdb.f.map_find_next(self.usage_map, self.map_sz, self.cur_phys_pg)
-            if next_pg < 0:
-                break  # unknow map type: goto fallback
-            if not next_pg:
-                return 0
+        while self.cur_dpg_idx < len(pages):
+            next_pg = pages[self.cur_dpg_idx]
+            self.cur_dpg_idx += 1
 
-            if next_pg == self.cur_phys_pg:
-                return 0  # Infinite loop
+            if self.read_ahead:
+                self.read_ahead.wait(next_pg)
 
             if not mdb.f.read_pg(next_pg):
                 print(f"error: reading page {next_pg} failed.")
@@ -338,36 +563,59 @@ class Table:
 
             self.cur_phys_pg = next_pg
 
+            if self.read_ahead:
+                self.read_ahead.schedule(pages[self.cur_dpg_idx: self.cur_dpg_idx + self.read_ahead.window])
+
             if mdb.f.pg_buf[0] == MDB_PAGE_DATA and get_int32(mdb.f.pg_buf, 4) == entry.table_pg:
                 return self.cur_phys_pg
 
-            # On rare occasion, mdb_map_find_next will return a wrong page
+            # On rare occasion, the usage map will list a wrong page
             # Found in a big file, over 4,000,000 records
-            print(f"warning: page {next_pg} from map doesn't match: Type={mdb.pg_buf[0]}, "
-                  f"buf[4..7]={get_int32(mdb.pg_buf, 4)} Expected table_pg={entry.table_pg}")
-        print("Warning: defaulting to brute force read")
+            print(f"warning: page {next_pg} from map doesn't match: Type={mdb.f.pg_buf[0]}, "
+                  f"buf[4..7]={get_int32(mdb.f.pg_buf, 4)} Expected table_pg={entry.table_pg}")
 
-        # can't do a fast read, go back to the old way
-        while True:
-            if not mdb.f.read_pg(self.cur_phys_pg):
-                self.cur_phys_pg += 1
+        return 0
+
+    def read_row(self, row):
+        if self.page_rows is not None:
+            # already cracked by prefetch_memos
+            decoded = self.page_rows[row] if row < len(self.page_rows) else None
+            if decoded is None:
+                return 0
+            starts, sizes, nulls = decoded
+        else:
+            if not self.decode_row(row):
                 return 0
-            self.cur_phys_pg += 1
+            decoder = self.decoder
+            starts = decoder.starts
+            sizes = decoder.sizes
+            nulls = decoder.nulls
 
-            if mdb.pg_buf[0] == MDB_PAGE_DATA and get_int32(mdb.pg_buf, 4) == entry.table_pg:
-                break
+        self.row_num += 1
 
-        return self.cur_phys_pg
+        # take advantage of mdb_crack_row() to clean up binding
+        # use num_cols instead of num_fields -- bsb 03/04/02
+        for i, col in enumerate(self.columns):
+            col.attempt_bind(nulls[i], starts[i], sizes[i])
 
-    def read_row(self, row):
-        mdb = self.mdb
+        return 1
 
-        if self.num_cols == 0 or not self.columns:
-            return 0
+    def get_decoder(self):
+        if self.decoder is None:
+            self.decoder = RowDecoder(self)
+
+        return self.decoder
+
+    def locate_row(self, row):
+        """
+         * Returns (row_start, row_size) of row number 'row' of the current page,
+         * or None when the row is missing or deleted.
+        """
+        mdb = self.mdb
 
         ret, row_start, row_size = mdb.f.find_row(row)
         if row_start == -1 or row_size == 0:
-            return 0
+            return None
 
         delflag = lookupflag = 0
         if row_start & 0x8000:
@@ -379,135 +627,109 @@ class Table:
         row_start &= OFFSET_MASK  # remove flags
 
         if not self.noskip_del and delflag:
-            return 0
-
-        fields = []
-        num_fields = self.crack_row(row_start, row_size, fields)
-
-        if num_fields < 0 or not self.test_sargs(fields, num_fields):
-            return 0
-
-        # take advantage of mdb_crack_row() to clean up binding
-        # use num_cols instead of num_fields -- bsb 03/04/02
-
-        for i in range(len(self.columns)):
-            col = self.columns[fields[i].colnum]
-            col.attempt_bind(fields[i].is_null, fields[i].start, fields[i].siz)
+            return None
 
-        return 1
+        return row_start, row_size
 
-    def crack_row3(self, row_start, row_end, bitmask_sz, row_var_cols):
+    def decode_row(self, row):
+        """
+         * Cracks row number 'row' of the current page with the table's decoder.
+         * Returns (row_start, row_size), or None for deleted, invalid or filtered
+         * out rows.
+        """
         mdb = self.mdb
-        var_col_offsets = []
 
-        row_len = row_end - row_start + 1
-        num_jumps = (row_len - 1) // 256
-        col_ptr = row_end - bitmask_sz - num_jumps - 1
-
-        # If last jump is a dummy value, ignore it
-        if (col_ptr - row_start - row_var_cols) // 256 < num_jumps:
-            num_jumps -= 1
-
-        if (bitmask_sz + num_jumps + 1) > row_end:
-            return 0
-
-        if col_ptr >= mdb.f.pg_size or col_ptr < row_var_cols:
-            return 0
+        if self.num_cols == 0 or not self.columns:
+            return None
 
-        jumps_used = 0
-        for i in range(row_var_cols + 1):
-            while (jumps_used < num_jumps) and i == mdb.pg_buf[row_end - bitmask_sz - jumps_used - 1]:
-                jumps_used += 1
+        located = self.locate_row(row)
+        if not located:
+            return None
 
-            var_col_offsets.append(mdb.f.pg_buf[col_ptr - i] + (jumps_used * 256))
+        num_fields = self.get_decoder().decode(mdb.f.pg_buf, located[0], located[1])
+        if num_fields < 0:
+            return None
 
-        return 1, var_col_offsets
+        # Field objects are only built when there are search arguments to test
+        if self.sarg_tree and not self.test_sargs(self.decoded_fields(), num_fields):
+            return None
 
-    def crack_row4(self, row_start, row_end, bitmask_sz, row_var_cols):
+        return located
+
+    def fetch_batch(self, max_pages=1, use_numpy=False):
+        """
+         * Decodes every live row of the next max_pages data pages column by
+         * column (see batch.Batch). Returns None when there are no more pages.
+         * A following fetch_row() continues with the next page.
+         *
+         * With use_numpy, fixed width columns are gathered for a whole page at
+         * once into NumPy arrays (numpy must be installed).
+        """
         mdb = self.mdb
 
-        if bitmask_sz + 3 + row_var_cols * 2 + 2 > row_end:
-            return 0, []
-
-        var_col_offsets = []
-        for i in range(row_var_cols + 1):
-            var_col_offsets.append(get_int16(mdb.f.pg_buf, row_end - bitmask_sz - 3 - (i * 2)))
+        if not self.columns:
+            return None
 
-        return 1, var_col_offsets
+        self.page_memos = None
+        self.page_rows = None
+        batch = Batch(self.columns, self.get_decoder(), use_numpy)
+        # rows only need to go through the row decoder for the columns that aren't gathered
+        per_row = bool(batch.row_columns) or bool(self.sarg_tree)
 
-    def crack_row(self, row_start, row_size, fields):
-        mdb = self.mdb
-        pg_buf = mdb.f.pg_buf
-        row_var_cols = 0
-        row_end = row_start + row_size - 1
+        while batch.pages < max_pages:
+            if not self.read_next_dpg():
+                break
 
-        is_jet3 = (mdb.f.jet_version == MDB_VER_JET3)
+            self.cur_pg_num = 1
+            batch.pages += 1
+            pg_buf = mdb.f.pg_buf
+            rows = get_int16(pg_buf, mdb.f.row_count_offset)
+            row_starts = []
+            row_sizes = []
+            for row in range(rows):
+                located = self.decode_row(row) if per_row else self.locate_row(row)
+                if not located:
+                    continue
+                if per_row:
+                    batch.append_row(pg_buf, self.decoder)
+                row_starts.append(located[0])
+                row_sizes.append(located[1])
+
+            if batch.vector_columns:
+                batch.append_page(pg_buf, row_starts, row_sizes, not per_row)
+            self.cur_row = rows
+
+        if not batch.pages:
+            return None
 
-        if is_jet3:
-            row_cols = get_byte(pg_buf, row_start)
-            col_count_size = 1
-        else:
-            row_cols = get_int16(pg_buf, row_start)
-            col_count_size = 2
+        return batch.finish()
 
-        bitmask_sz = (row_cols + 7) // 8
-        if (bitmask_sz + (0 if is_jet3 else 1)) >= row_end:
+    def crack_row(self, row_start, row_size, fields):
+        row_cols = self.get_decoder().decode(self.mdb.f.pg_buf, row_start, row_size)
+        if row_cols < 0:
             return -1
 
-        nullmask = pg_buf[row_end - bitmask_sz + 1: row_end + 1]
-
-        # read table of variable column locations */
-        if self.num_var_cols > 0:
-            # row_var_cols = mdb_get_byte(pg_buf, row_end - bitmask_sz) \
-            #    if is_jet3 else mdb_get_int16(pg_buf, row_end - bitmask_sz - 1)
-            if is_jet3:
-                row_var_cols = get_byte(pg_buf, row_end - bitmask_sz)
-                success, var_col_offsets = self.crack_row3(row_start, row_end, bitmask_sz, row_var_cols)
-            else:
-                row_var_cols = get_int16(pg_buf, row_end - bitmask_sz - 1)
-                success, var_col_offsets = self.crack_row4(row_start, row_end, bitmask_sz, row_var_cols)
-
-            if not success:
-                return -1
-
-        fixed_cols_found = 0
-        row_fixed_cols = row_cols - row_var_cols
-
-        for i in range(self.num_cols):
-            fields.append(Field(mdb))
-            col = self.columns[i]
-            fields[i].colnum = i
-            fields[i].is_fixed = col.is_fixed
-            byte_num = col.col_num // 8
-            bit_num = col.col_num % 8
-            # logic on nulls is reverse, 1 is not null, 0 is null */
-            fields[i].is_null = 0 if nullmask[byte_num] & (1 << bit_num) else 1
-
-            if fields[i].is_fixed and (fixed_cols_found < row_fixed_cols):
-                col_start = col.fixed_offset + col_count_size
-                fields[i].start = row_start + col_start
-                fields[i].value = pg_buf[row_start + col_start:row_start + col_start + col.col_size]
-                fields[i].siz = col.col_size
-                fixed_cols_found += 1
-                # Use col.var_col_num because a deleted column is still
-                # present in the variable column offsets table for the row */
-            elif not fields[i].is_fixed and (col.var_col_num < row_var_cols):
-                col_start = var_col_offsets[col.var_col_num]
-                fields[i].start = row_start + col_start
-                tam = var_col_offsets[col.var_col_num + 1] - col_start
-                fields[i].value = pg_buf[row_start + col_start:row_start + col_start + tam]
-                fields[i].siz = tam
-            else:
-                fields[i].start = 0
-                fields[i].value = None
-                fields[i].siz = 0
-                fields[i].is_null = 1
+        fields += self.decoded_fields()
+        return row_cols
 
-            if (fields[i].start + fields[i].siz) > row_start + row_size:
-                print("warning: Invalid data location detected in mdb_crack_row. Table:{table.name} Column:{i}")
-                return -1, None
+    def decoded_fields(self):
+        # Field objects for the row last cracked by the decoder
+        mdb = self.mdb
+        pg_buf = mdb.f.pg_buf
+        decoder = self.decoder
+        fields = []
 
-        return row_cols
+        for i, col in enumerate(self.columns):
+            field = Field(mdb)
+            field.colnum = i
+            field.is_fixed = col.is_fixed
+            field.is_null = decoder.nulls[i]
+            field.start = decoder.starts[i]
+            field.siz = decoder.sizes[i]
+            field.value = pg_buf[field.start: field.start + field.siz] if field.siz else None
+            fields.append(field)
+
+        return fields
 
     def test_sargs(self, fields, num_fields):
         entry = self.entry
@@ -0,0 +1,91 @@
+import os
+import struct
+import unittest
+
+from batch import Batch, np
+from column import Column
+from consts import MDB_BOOL
+from mdb import Mdb
+
+SAMPLE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "sample.mdb")
+
+
+def batch_values(table, use_numpy):
+    table.rewind_table()
+    batches = []
+    while True:
+        batch = table.fetch_batch(3, use_numpy=use_numpy)
+        if batch is None:
+            return batches
+        batches.append([[value.item() if hasattr(value, "item") else value for value in bcol.to_list()]
+                        for bcol in batch.columns])
+
+
+class BatchTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.mdb = Mdb(SAMPLE)
+
+    def test_rows_match_fetch_row(self):
+        table = self.mdb.read_table_by_name("orders")
+        table.read_columns()
+        rows = list(table.iter_rows(typed=True))
+        columns = [value for batch in batch_values(table, False) for value in zip(*batch)]
+        self.assertEqual(columns, rows)
+
+    @unittest.skipIf(np is None, "numpy is not installed")
+    def test_numpy_matches_lists(self):
+        for entry in self.mdb.catalog:
+            table = self.mdb.read_table_by_name(entry.object_name)
+            table.read_columns()
+            self.assertEqual(batch_values(table, True), batch_values(table, False), entry.object_name)
+
+    def short_row_table(self):
+        # orders plus a boolean column added after some rows were written
+        table = self.mdb.read_table_by_name("orders")
+        table.read_columns()
+        flag = Column(self.mdb)
+        flag.table = table
+        flag.name = "shipped"
+        flag.col_type = MDB_BOOL
+        flag.is_fixed = 1
+        flag.col_num = 4
+        flag.fixed_offset = 16
+        table.columns.append(flag)
+        table.num_cols += 1
+        table.decoder = None
+
+        # Jet4 rows: column count, fixed data, null mask. All null mask bits are
+        # set, even those of the columns a row doesn't store.
+        rows = [struct.pack("<h4iB", 5, 1, 10, 100, 7, 0x1f),  # every column
+                struct.pack("<h2iB", 2, 2, 20, 0x1f),          # stored before the last two fixed columns existed
+                struct.pack("<h2iB", 4, 3, 30, 0x1f)]          # claims four fixed columns but only holds two
+        page = bytearray(table.mdb.f.pg_size)
+        starts = []
+        pos = 100
+        for row in rows:
+            page[pos: pos + len(row)] = row
+            starts.append(pos)
+            pos += 100
+        return table, bytes(page), starts, [len(row) for row in rows]
+
+    def test_rows_with_fewer_fixed_columns(self):
+        table, page, starts, sizes = self.short_row_table()
+        decoder = table.get_decoder()
+        batch = Batch(table.columns, decoder)
+        for start, size in zip(starts, sizes):
+            if decoder.decode(page, start, size) >= 0:
+                batch.append_row(page, decoder)
+        rows = list(zip(*[bcol.to_list() for bcol in batch.finish().columns]))
+        self.assertEqual(rows, [(1, 10, 100, 7, True), (2, 20, None, None, False)])
+
+        if np is not None:
+            batch = Batch(table.columns, decoder, use_numpy=True)
+            batch.append_page(page, starts, sizes, True)
+            gathered = list(zip(*[[value.item() if hasattr(value, "item") else value for value in bcol.to_list()]
+                                  for bcol in batch.finish().columns]))
+            self.assertEqual(gathered, rows)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime
+from decimal import Decimal
+
+from consts import (MDB_QUOTE_ALL, MDB_QUOTE_NONE, MDB_BINEXPORT_STRIP, MDB_BINEXPORT_RAW, MDB_BINEXPORT_OCTAL)
+from csv_writer import CsvWriter
+
+
+class CsvWriterTest(unittest.TestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix=".csv")
+        os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def write(self, rows, **options):
+        writer = CsvWriter(self.path, **options)
+        for row in rows:
+            writer.write_row(row)
+        writer.close()
+        with open(self.path, "rb") as inp:
+            return inp.read()
+
+    def test_minimal_quoting(self):
+        rows = [["plain", "a;b", 'say "hi"', "two\nlines", "cr\rhere"]]
+        self.assertEqual(self.write(rows),
+                         b'plain;"a;b";"say ""hi""";"two\nlines";"cr\rhere"\n')
+
+    def test_quote_all(self):
+        self.assertEqual(self.write([["a", "", None, 1, b"\x01"]], quoting=MDB_QUOTE_ALL),
+                         b'"a";"";;"1";"01"\n')
+
+    def test_quote_none(self):
+        self.assertEqual(self.write([["a;b", 'q"', ""]], quoting=MDB_QUOTE_NONE), b'a;b;q";\n')
+
+    def test_escape_char(self):
+        self.assertEqual(self.write([['say "hi"']], escape_char="\\"), b'"say \\"hi\\""\n')
+
+    def test_null_and_empty(self):
+        self.assertEqual(self.write([[None, "", "x"]], null_text="NULL"), b"NULL;;x\n")
+
+    def test_delimiters_and_encoding(self):
+        rows = [["ação", "a,b"], ["x", None]]
+        self.assertEqual(self.write(rows, delimiter=",", row_delimiter="\r\n", encoding="cp1252"),
+                         b'a\xe7\xe3o,"a,b"\r\nx,\r\n')
+
+    def test_native_values(self):
+        row = [True, False, -7, 2.5, 1.100000023841858, Decimal("-12.3400"), datetime(1999, 10, 3, 22, 45, 12)]
+        self.assertEqual(self.write([row], single_columns=[4], date_fmt="%Y-%m-%d %H:%M:%S"),
+                         b"1;0;-7;2.5;1.1;-12.3400;1999-10-03 22:45:12\n")
+        self.assertEqual(self.write([[2.5, 1.1]], float_format=".3f"), b"2.500;1.100\n")
+
+    def test_binary_modes(self):
+        value = b"\x00\xab;"
+        self.assertEqual(self.write([[value]]), b"00AB3B\n")
+        self.assertEqual(self.write([[value]], bin_mode=MDB_BINEXPORT_OCTAL), b"\\000\\253\\073\n")
+        self.assertEqual(self.write([[value]], bin_mode=MDB_BINEXPORT_RAW, encoding="latin-1"), b'"\x00\xab;"\n')
+        self.assertEqual(self.write([[value, "x"]], bin_mode=MDB_BINEXPORT_STRIP), b";x\n")
+
+    def test_rows_are_flushed_in_groups(self):
+        rows = [[str(i)] for i in range(25)]
+        self.assertEqual(self.write(rows, rows_per_write=10), "".join(f"{i}\n" for i in range(25)).encode())
+
+
+if __name__ == "__main__":
+    unittest.main()
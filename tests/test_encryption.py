@@ -0,0 +1,87 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from mdb import Mdb
+
+SAMPLE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "sample.mdb")
+HEADER_KEY = bytes([0xC7, 0xDA, 0x39, 0x6B])
+DB_KEY = 0x5A3C96E1
+
+
+def rc4(key, data):
+    # Plain RC4, independent of utils.mdbi_rc4
+    s = list(range(256))
+    j = 0
+    for i in range(256):
+        j = (j + s[i] + key[i % len(key)]) & 0xff
+        s[i], s[j] = s[j], s[i]
+
+    out = bytearray()
+    i = j = 0
+    for byte in data:
+        i = (i + 1) & 0xff
+        j = (j + s[i]) & 0xff
+        s[i], s[j] = s[j], s[i]
+        out.append(byte ^ s[(s[i] + s[j]) & 0xff])
+    return bytes(out)
+
+
+def encode_file(data, pg_size, db_key):
+    # Stores db_key in the (RC4 encoded) header of page 0 and encodes every other page with db_key ^ pg
+    header = bytearray(rc4(HEADER_KEY, data[0x18: 0x18 + 128]))
+    header[0x3e - 0x18: 0x42 - 0x18] = db_key.to_bytes(4, "little")
+    pages = [data[:0x18] + rc4(HEADER_KEY, bytes(header)) + data[0x18 + 128: pg_size]]
+    for pg in range(1, len(data) // pg_size):
+        pages.append(rc4((db_key ^ pg).to_bytes(4, "little"), data[pg * pg_size: (pg + 1) * pg_size]))
+    return b"".join(pages)
+
+
+class EncryptionTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        with open(SAMPLE, "rb") as inp:
+            cls.plain = inp.read()
+        cls.pg_size = Mdb(SAMPLE).f.pg_size
+        cls.num_pages = len(cls.plain) // cls.pg_size
+        cls.tmp_dir = tempfile.mkdtemp()
+        cls.path = os.path.join(cls.tmp_dir, "encoded.mdb")
+        with open(cls.path, "wb") as out:
+            out.write(encode_file(cls.plain, cls.pg_size, DB_KEY))
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmp_dir)
+
+    def plain_pg(self, pg):
+        return self.plain[pg * self.pg_size: (pg + 1) * self.pg_size]
+
+    def test_read_pages(self):
+        for use_mmap in (True, False):
+            f = Mdb(self.path, use_mmap=use_mmap).f
+            self.assertEqual(f.db_key, DB_KEY)
+            self.assertEqual(f.map is not None, use_mmap)
+            for pg in range(1, self.num_pages):
+                self.assertEqual(bytes(f.get_pg(pg)), self.plain_pg(pg), (use_mmap, pg))
+
+    def test_load_pg_run(self):
+        for use_mmap in (True, False):
+            f = Mdb(self.path, use_mmap=use_mmap).f
+            f.cache.clear()
+            self.assertEqual(f.load_pg_run(1, self.num_pages - 1), self.num_pages - 1)
+            for pg in range(1, self.num_pages):
+                self.assertEqual(bytes(f.cache.get(pg)), self.plain_pg(pg), (use_mmap, pg))
+
+    def test_tables_match_plain_file(self):
+        plain = Mdb(SAMPLE)
+        encoded = Mdb(self.path)
+        self.assertEqual([entry.object_name for entry in encoded.catalog],
+                         [entry.object_name for entry in plain.catalog])
+        for name in ("customers", "orders", "products"):
+            self.assertEqual(list(encoded.read_table_by_name(name).iter_rows(typed=True)),
+                             list(plain.read_table_by_name(name).iter_rows(typed=True)), name)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+import io
+import struct
+import unittest
+from datetime import datetime, timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+
+from consts import MDB_BOOL, MDB_INT, MDB_LONGINT, MDB_DOUBLE, MDB_DATETIME, MDB_NUMERIC, MDB_TEXT, MDB_BINARY
+from pg_copy import PGCOPY_HEADER, PG_EPOCH, PgCopyWriter, encode_numeric, encode_timestamp
+
+
+def read_pgcopy(data):
+    # Minimal binary COPY reader: returns the rows as lists of raw field bytes (None for nulls)
+    assert data.startswith(PGCOPY_HEADER)
+    pos = len(PGCOPY_HEADER)
+    rows = []
+    while True:
+        (count,) = struct.unpack_from(">h", data, pos)
+        pos += 2
+        if count == -1:
+            break
+        row = []
+        for _ in range(count):
+            (size,) = struct.unpack_from(">i", data, pos)
+            pos += 4
+            if size == -1:
+                row.append(None)
+            else:
+                row.append(data[pos: pos + size])
+                pos += size
+        rows.append(row)
+
+    assert pos == len(data)
+    return rows
+
+
+def decode_numeric(data):
+    ndigits, weight, sign, dscale = struct.unpack_from(">hhHh", data)
+    digits = struct.unpack_from(f">{ndigits}h", data, 8)
+    value = sum((Decimal(digit).scaleb(4 * (weight - i)) for i, digit in enumerate(digits)), Decimal(0))
+    value = value.quantize(Decimal(1).scaleb(-dscale))
+    return -value if sign == 0x4000 else value
+
+
+def decode_timestamp(data):
+    return PG_EPOCH + timedelta(microseconds=struct.unpack(">q", data)[0])
+
+
+class PgCopyTest(unittest.TestCase):
+    def test_numeric_round_trip(self):
+        for text in ("0", "0.0000", "12.5", "-0.0001", "10000", "0.5", "123456789.1234", "-922337203685477.5808",
+                     "99999999999999999999999999.99", "1E+10", "0.000000001"):
+            value = Decimal(text)
+            decoded = decode_numeric(encode_numeric(value))
+            self.assertEqual(decoded, value, text)
+            self.assertEqual(decoded.as_tuple().exponent, min(value.as_tuple().exponent, 0), text)
+
+    def test_timestamp_round_trip(self):
+        for value in (datetime(2000, 1, 1), datetime(1999, 10, 3, 22, 45, 12), datetime(1899, 12, 30),
+                      datetime(2038, 1, 19, 3, 14, 8), datetime(1, 1, 1)):
+            self.assertEqual(decode_timestamp(encode_timestamp(value)), value)
+
+    def test_stream(self):
+        columns = [SimpleNamespace(col_type=col_type, col_prec=10, col_scale=2)
+                   for col_type in (MDB_BOOL, MDB_INT, MDB_LONGINT, MDB_DOUBLE, MDB_DATETIME, MDB_NUMERIC, MDB_TEXT,
+                                    MDB_BINARY)]
+        rows = [
+            (True, -2, 70000, 1.5, datetime(1999, 10, 3, 22, 45, 12), Decimal("-12.34"), "ação", b"\x00\xff"),
+            (False, None, None, None, None, None, "", None),
+        ]
+        out = io.BytesIO()
+        writer = PgCopyWriter(out, columns, rows_per_write=1)
+        for row in rows:
+            writer.write_row(row)
+        writer.close()
+
+        first, second = read_pgcopy(out.getvalue())
+        self.assertEqual(first[0], b"\x01")
+        self.assertEqual(struct.unpack(">h", first[1])[0], -2)
+        self.assertEqual(struct.unpack(">i", first[2])[0], 70000)
+        self.assertEqual(struct.unpack(">d", first[3])[0], 1.5)
+        self.assertEqual(decode_timestamp(first[4]), rows[0][4])
+        self.assertEqual(decode_numeric(first[5]), Decimal("-12.34"))
+        self.assertEqual(first[6].decode("utf-8"), "ação")
+        self.assertEqual(first[7], b"\x00\xff")
+        self.assertEqual(second, [b"\x00", None, None, None, None, None, b"", None])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,48 @@
+import random
+import unittest
+
+from utils import decompress_unicode
+
+
+def decompress_unicode_loop(src):
+    # The byte at a time decoder decompress_unicode replaced, kept as reference
+    dst = bytearray()
+    compress = 1
+    isrc = 0
+    slen = len(src)
+    while slen > 0:
+        if src[isrc] == 0:
+            compress = 0 if compress else 1
+            isrc += 1
+            slen -= 1
+        elif compress:
+            dst += bytes((src[isrc], 0))
+            isrc += 1
+            slen -= 1
+        elif slen >= 2:
+            dst += src[isrc: isrc + 2]
+            isrc += 2
+            slen -= 2
+        else:
+            break
+
+    return dst.decode("utf-16-le", "replace")
+
+
+class DecompressUnicodeTest(unittest.TestCase):
+    def test_known_values(self):
+        self.assertEqual(decompress_unicode(b"Chair"), "Chair")
+        self.assertEqual(decompress_unicode(b"ab\x00c\x01d\x00"), "abţd")
+        self.assertEqual(decompress_unicode(b""), "")
+
+    def test_matches_byte_loop(self):
+        rnd = random.Random(1234)
+        # no 0xd8-0xdf bytes: surrogate halves split across runs are decoded per run
+        alphabet = b"\x00\x00\x00Aaz \xe9\xff\x01\x04\x20"
+        for _ in range(5000):
+            src = bytes(rnd.choice(alphabet) for _ in range(rnd.randint(0, 40)))
+            self.assertEqual(decompress_unicode(src), decompress_unicode_loop(src), src)
+
+
+if __name__ == "__main__":
+    unittest.main()
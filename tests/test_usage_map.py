@@ -0,0 +1,65 @@
+import os
+import random
+import struct
+import unittest
+
+from mdb import Mdb
+
+SAMPLE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "sample.mdb")
+
+
+def find_next_pages(f, p_map, map_sz):
+    # Pages of a usage map as listed by the page at a time map_find_next scan
+    pages = []
+    pg = 0
+    while True:
+        pg = f.map_find_next(p_map, map_sz, pg)
+        if pg <= 0:
+            return pages
+        pages.append(pg)
+
+
+class UsageMapTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.mdb = Mdb(SAMPLE)
+        cls.f = cls.mdb.f
+
+    def test_sample_tables(self):
+        for entry in self.mdb.catalog:
+            table = self.mdb.read_table_by_name(entry.object_name)
+            expected = find_next_pages(self.f, table.usage_map, table.map_sz)
+            self.assertEqual(list(self.f.map_pages(table.usage_map, table.map_sz)), expected, entry.object_name)
+
+    def test_type0_maps(self):
+        rnd = random.Random(42)
+        for _ in range(200):
+            bitmap = bytes(rnd.choice((0, 0, 0xff, rnd.randrange(256))) for _ in range(rnd.randint(0, 64)))
+            p_map = bytes((0,)) + struct.pack("<I", rnd.randint(1, 100000)) + bitmap
+            self.assertEqual(list(self.f.map_pages(p_map, len(p_map))), find_next_pages(self.f, p_map, len(p_map)))
+
+    def test_type1_maps(self):
+        f = self.f
+        rnd = random.Random(7)
+        bitmap_pages = {}
+        p_map = bytearray((1,))
+        for map_ind in range(4):
+            map_pg = 0 if map_ind == 2 else 100000 + map_ind
+            p_map += struct.pack("<I", map_pg)
+            if map_pg:
+                bitmap = bytearray(rnd.choice((0, 0, rnd.randrange(256))) for _ in range(f.pg_size - 4))
+                bitmap[0] &= 0xfe  # page 0 would read as the end of the map
+                bitmap_pages[map_pg] = bytes(4) + bytes(bitmap)
+
+        get_pg = f.get_pg
+        f.get_pg = lambda pg: bitmap_pages[pg] if pg in bitmap_pages else get_pg(pg)
+        try:
+            expected = find_next_pages(f, p_map, len(p_map))
+            self.assertTrue(expected)
+            self.assertEqual(list(f.map_pages(p_map, len(p_map))), expected)
+        finally:
+            del f.get_pg
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+import struct
+import unittest
+from types import SimpleNamespace
+
+from batch import BatchColumn, np
+from consts import MDB_MONEY, MDB_NUMERIC, MDB_BRACES_4_2_2_8, MDB_NOBRACES_4_2_2_2_6
+from utils import money_to_string, money_ints_to_strings, numeric_to_int, numeric_to_string, \
+    numeric_ints_to_strings, uuid_to_string
+
+
+def encode_numeric(value):
+    # MDB_NUMERIC field: sign byte, then the 128 bit magnitude as 32 bit words, most significant first
+    magnitude = abs(value)
+    words = [(magnitude >> shift) & 0xffffffff for shift in (96, 64, 32, 0)]
+    return struct.pack("<B4I", 0x80 if value < 0 else 0, *words)
+
+
+class MoneyTest(unittest.TestCase):
+    def test_money_to_string(self):
+        for value, text in ((0, "0.0000"), (1, "0.0001"), (12345678, "1234.5678"), (10000, "1.0000"),
+                            (-5, "-0.0005"), (-10000, "-1.0000"), (-123456789, "-12345.6789"),
+                            (2 ** 63 - 1, "922337203685477.5807"), (-2 ** 63, "-922337203685477.5808")):
+            self.assertEqual(money_to_string(b"\xaa" + struct.pack("<q", value), 1), text, value)
+
+    def test_money_ints_to_strings(self):
+        self.assertEqual(money_ints_to_strings([0, -1, 250000]), ["0.0000", "-0.0001", "25.0000"])
+
+
+class NumericTest(unittest.TestCase):
+    def test_word_order(self):
+        buf = struct.pack("<B4I", 0, 1, 2, 3, 4)
+        self.assertEqual(numeric_to_int(buf, 0), (1 << 96) | (2 << 64) | (3 << 32) | 4)
+
+    def test_sign_byte(self):
+        self.assertEqual(numeric_to_int(struct.pack("<B4I", 0x80, 0, 0, 0, 7), 0), -7)
+        self.assertEqual(numeric_to_int(struct.pack("<B4I", 0x01, 0, 0, 0, 7), 0), 7)
+
+    def test_numeric_to_string(self):
+        for value, scale, text in ((0, 0, "0"), (0, 2, "0.00"), (12345, 2, "123.45"), (-12345, 2, "-123.45"),
+                                   (5, 4, "0.0005"), (-5, 4, "-0.0005"), (42, 0, "42"),
+                                   (10 ** 28 - 1, 10, "999999999999999999.9999999999"),
+                                   (-(2 ** 100), 0, str(-(2 ** 100)))):
+            buf = b"\x00\x00" + encode_numeric(value)
+            self.assertEqual(numeric_to_int(buf, 2), value)
+            self.assertEqual(numeric_to_string(buf, 2, scale), text, (value, scale))
+
+    def test_numeric_ints_to_strings(self):
+        self.assertEqual(numeric_ints_to_strings([150, -3, 0], 2), ["1.50", "-0.03", "0.00"])
+
+
+class RepidTest(unittest.TestCase):
+    # GUID 00112233-4455-6677-8899-AABBCCDDEEFF: the first three groups are stored little-endian
+    GUID = bytes.fromhex("33221100554477668899aabbccddeeff")
+
+    def test_formats(self):
+        self.assertEqual(uuid_to_string(self.GUID, 0, MDB_BRACES_4_2_2_8), "{00112233-4455-6677-8899AABBCCDDEEFF}")
+        self.assertEqual(uuid_to_string(self.GUID, 0, MDB_NOBRACES_4_2_2_2_6), "00112233-4455-6677-8899-AABBCCDDEEFF")
+        self.assertEqual(uuid_to_string(b"\x00" * 3 + self.GUID, 3, "XXXXXXXXXXXXXXXX"),
+                         "00112233445566778899AABBCCDDEEFF")
+
+
+class BatchStringsTest(unittest.TestCase):
+    def batch_column(self, col_type, values, nulls, scale=0):
+        bcol = BatchColumn(SimpleNamespace(name="value", col_type=col_type, col_scale=scale))
+        bcol.values = values
+        bcol.nulls = bytearray(nulls)
+        return bcol
+
+    def test_money_with_nulls(self):
+        bcol = self.batch_column(MDB_MONEY, [15000, None, -1], [0, 1, 0])
+        self.assertEqual(bcol.to_strings(), ["1.5000", None, "-0.0001"])
+
+    def test_numeric_with_nulls(self):
+        bcol = self.batch_column(MDB_NUMERIC, [None, 12345, -5], [1, 0, 0], scale=3)
+        self.assertEqual(bcol.to_strings(), [None, "12.345", "-0.005"])
+
+    @unittest.skipIf(np is None, "numpy is not installed")
+    def test_gathered_money(self):
+        # null entries of gathered columns are undefined
+        bcol = self.batch_column(MDB_MONEY, np.array([15000, 99, -1], dtype="<i8"), [0, 1, 0])
+        bcol.nulls = np.array([False, True, False])
+        self.assertEqual(bcol.to_strings(), ["1.5000", None, "-0.0001"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -16,8 +16,17 @@
     along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
 
+import math
+import re
 import struct
-from datetime import datetime
+import uuid
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 from arc4 import ARC4
 
@@ -26,160 +35,326 @@ from consts import MDB_EQUAL, MDB_LT, MDB_GTEQ, MDB_LTEQ, MDB_NEQ, MDB_LIKE, MDB
     MDB_MONEY
 
 
+# Precompiled little-endian decoders; unpack_from reads straight from any buffer without slicing
+INT16 = struct.Struct("<H")
+INT32 = struct.Struct("<I")
+INT32_MSB = struct.Struct(">I")
+SINT16 = struct.Struct("<h")
+SINT32 = struct.Struct("<i")
+SINT64 = struct.Struct("<q")
+NUMERIC = struct.Struct("<B4I")  # sign byte, then 4 little-endian words, most significant first
+SINGLE = struct.Struct("<f")
+DOUBLE = struct.Struct("<d")
+
+_int16_arrays = {}
+
+
 def get_byte(buf, offset):
     return buf[offset]
 
 
 def get_int16(buf, offset):
-    u8_buf = buf[offset: offset + 2]
-    return (u8_buf[0] << 0) + (u8_buf[1] << 8)
+    return INT16.unpack_from(buf, offset)[0]
 
 
 def get_int32(buf, offset):
-    u8_buf = buf[offset: offset + 4]
-
-    return (u8_buf[0] << 0) + (u8_buf[1] << 8) + (u8_buf[2] << 16) + (u8_buf[3] << 24)
+    return INT32.unpack_from(buf, offset)[0]
 
 
 def get_int32_msb(buf, offset):
-    u8_buf = buf[offset: offset + 4]
-    return (u8_buf[0] << 24) + (u8_buf[1] << 16) + (u8_buf[2] << 8) + (u8_buf[3] << 0)
+    return INT32_MSB.unpack_from(buf, offset)[0]
 
 
-def get_single(buf, offset):
-    u8_buf = buf[offset:offset + 4]
+def get_int16_signed(buf, offset):
+    return SINT16.unpack_from(buf, offset)[0]
+
+
+def get_int32_signed(buf, offset):
+    return SINT32.unpack_from(buf, offset)[0]
 
-    return struct.unpack('f', u8_buf)[0]
+
+def get_int64_signed(buf, offset):
+    return SINT64.unpack_from(buf, offset)[0]
+
+
+def get_single(buf, offset):
+    return SINGLE.unpack_from(buf, offset)[0]
 
 
 def get_double(buf, offset):
-    u8_buf = buf[offset: offset + 8]
+    return DOUBLE.unpack_from(buf, offset)[0]
 
-    num_double = struct.unpack('d', u8_buf)[0]
 
-    # return ((u8_buf[0] << 0) + (u8_buf[1] << 8) + (u8_buf[2] << 16) + (u8_buf[3] << 24) +
-    #        (u8_buf[4] << 32) + (u8_buf[5] << 40) + (u8_buf[6] << 48) + (u8_buf[7] << 56))
+def get_int16_array(buf, offset, count):
+    """
+     * Reads count consecutive 16 bit integers starting at offset with a
+     * single unpack call, e.g. a row's whole variable column offset table.
+    """
+    decoder = _int16_arrays.get(count)
+    if decoder is None:
+        decoder = _int16_arrays[count] = struct.Struct(f"<{count}H")
 
-    return int(num_double)
+    return decoder.unpack_from(buf, offset)
 
 
 def mdbi_rc4(key, buf):
-    arc4 = ARC4(key)
-    tam = len(buf)
-    cipher = arc4.encrypt(buf[:tam])
+    arc4 = ARC4(bytes(key))
+    cipher = arc4.encrypt(bytes(buf))
     return cipher
 
 
-def decompress_unicode(src, dst):
+def decompress_unicode(src):
     """
      * This function is used in reading text data from an MDB table.
-     * 'dest' will receive a converted, null-terminated string.
-     * dlen is the available size of the destination buffer.
-     * Returns the length of the converted string, not including the terminator.
+     * Jet4 compressed text alternates runs of one byte characters (the low
+     * byte of UTF-16) and runs of plain UTF-16LE characters; a 0x00 byte
+     * toggles between the two. Each run is located with find() and decoded
+     * in bulk.
+     * Returns the decoded string.
     """
-    compress = 1
-    tlen = 0
+    src = bytes(src)
     slen = len(src)
-    dlen = len(dst)
+    parts = []
+    compress = 1
     isrc = 0
-    while slen > 0 and tlen < dlen:
-        if src[isrc] == 0:
-            compress = 0 if compress else 1
-            isrc += 1
-            slen -= 1
-        elif compress:
-            dst[tlen] = src[isrc]
-            tlen += 1
-            isrc += 1
-            dst[tlen] = 0
-            tlen += 1
-            slen -= 1
-        elif slen >= 2:
-            dst[tlen] = src[isrc]
-            tlen += 1
-            isrc += 1
-            dst[tlen] = src[isrc]
-            tlen += 1
-            isrc += 1
-            slen -= 2
+
+    while isrc < slen:
+        if compress:
+            end = src.find(b"\x00", isrc)
+            if end == -1:
+                end = slen
+            parts.append(src[isrc:end].decode("latin-1"))
         else:
-            break
+            # in a UTF-16 run only a 0x00 at a character boundary is a toggle
+            k = src[isrc::2].find(b"\x00")
+            end = slen if k == -1 else isrc + 2 * k
+            parts.append(src[isrc:end - (end - isrc) % 2].decode("utf-16-le", "replace"))
 
-    return tlen
+        isrc = end + 1
+        compress = 0 if compress else 1
 
+    return "".join(parts)
 
-def date_to_string(fmt, buf, start):
-    td = get_double(buf, start)
-    t = date_to_tm(td)
-    dt_hr = datetime(t.tm_year, t.tm_mon, t.tm_mday, t.tm_hour, t.tm_min, t.tm_sec)
-    text = dt_hr.strftime(fmt)
 
-    return text
+def scaled_int_to_string(value, scale):
+    # Text of value / 10 ** scale without going through float or Decimal
+    text = str(abs(value))
+    if scale > 0:
+        text = text.rjust(scale + 1, "0")
+        text = f"{text[:-scale]}.{text[-scale:]}"
+
+    return f"-{text}" if value < 0 else text
+
+
+def money_to_string(buf, start):
+    # MDB_MONEY is a signed 64 bit integer scaled by 10000
+    return scaled_int_to_string(get_int64_signed(buf, start), 4)
+
+
+def money_ints_to_strings(values):
+    return [scaled_int_to_string(int(value), 4) for value in values]
+
+
+def numeric_to_int(buf, start):
+    """
+     * Unscaled value of an MDB_NUMERIC field: a sign byte (0x80 = negative)
+     * followed by a 128 bit integer stored as four 32 bit little-endian words,
+     * most significant word first.
+    """
+    sign, w0, w1, w2, w3 = NUMERIC.unpack_from(buf, start)
+    value = (w0 << 96) | (w1 << 64) | (w2 << 32) | w3
+
+    return -value if sign & 0x80 else value
+
+
+def numeric_to_string(buf, start, scale):
+    return scaled_int_to_string(numeric_to_int(buf, start), scale)
+
+
+def numeric_ints_to_strings(values, scale):
+    return [scaled_int_to_string(value, scale) for value in values]
+
+
+@lru_cache(maxsize=16)
+def repid_template(fmt):
+    """
+     * Turns a repid format such as MDB_BRACES_4_2_2_8 ("{XXXX-XX-XX-XXXXXXXX}",
+     * one X per byte) into a str.format template and the slices of the 32
+     * hex digits of the GUID that fill it.
+    """
+    template = ""
+    groups = []
+    pos = i = 0
+    while i < len(fmt):
+        if fmt[i] == "X":
+            j = i
+            while j < len(fmt) and fmt[j] == "X":
+                j += 1
+            template += "{%d}" % len(groups)
+            groups.append((pos, pos + 2 * (j - i)))
+            pos += 2 * (j - i)
+            i = j
+        else:
+            template += fmt[i].replace("{", "{{").replace("}", "}}")
+            i += 1
+
+    return template, tuple(groups)
+
+
+def uuid_to_string(buf, start, fmt):
+    # MDB_REPID: a GUID, whose first three groups are little-endian
+    digits = uuid.UUID(bytes_le=bytes(buf[start: start + 16])).hex.upper()
+    template, groups = repid_template(fmt)
+
+    return template.format(*[digits[a:b] for a, b in groups])
+
 
+OLE_EPOCH = datetime(1899, 12, 30)
+OLE_MIN_SECONDS = (datetime(1, 1, 1) - OLE_EPOCH) // timedelta(seconds=1)
+OLE_MAX_SECONDS = (datetime(9999, 12, 31, 23, 59, 59) - OLE_EPOCH) // timedelta(seconds=1)
+DATE_CACHE_SIZE = 65536
+TIME_DIRECTIVES = "HIMSpXfTrRz"
+DATE_FMT_TOKEN = re.compile(r"%[-_0^#]*[EO]?.|%$|[^%]+", re.S)
 
-class Tm:
-    tm_sec = 0         # Segundos (0-59)
-    tm_min = 0         # Minutos (0-59)
-    tm_hour = 0        # Horas (0-23)
-    tm_mday = 0        # Dia do mês (1-31)
-    tm_mon = 0         # Mês (0-11)
-    tm_year = 0        # Ano - 1900
-    tm_wday = 0        # Dia da semana (0-6, onde 0 é Domingo)
-    tm_yday = 0        # Dia do ano (0-365, onde 0 é 1 de janeiro)
-    tm_isdst = 0       # Flag de horário de verão (positivo, negativo ou zero)
 
-noleap_cal = [0, 31, 59, 90, 120, 151, 181, 212, 243, 273, 304, 334, 365]
-leap_cal = [0, 31, 60, 91, 121, 152, 182, 213, 244, 274, 305, 335, 366]
+def ole_to_seconds(td):
+    """
+     * Seconds since 1899-12-30 of an OLE automation date, rounded to the
+     * second. The integer part counts days; the fraction is the time of day
+     * even for negative (pre-1899) dates. td must be finite.
+    """
+    days = int(td)
+    return days * 86400 + int(abs(td - days) * 86400.0 + 0.5)
+
 
+def ole_to_datetime(td):
+    if not math.isfinite(td):
+        return None
 
-def date_to_tm(td):
-    t = Tm()
+    try:
+        return OLE_EPOCH + timedelta(seconds=ole_to_seconds(td))
+    except OverflowError:
+        return None
 
-    if td < 0.0 or td > 1e6:
-        return
 
-    yr = 1
-    day = td
-    time = (td - day) * 86400.0 + 0.5
-    t.tm_hour = time / 3600
-    t.tm_min = (time / 60) % 60
-    t.tm_sec = time % 60
+def ole_to_datetime64(values):
+    """
+     * Vectorized ole_to_datetime: converts an array of OLE automation dates
+     * to a numpy datetime64[s] array. Invalid dates (see ole_invalid_mask)
+     * become NaT.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    invalid = ole_invalid_mask(values)
+    values = np.where(invalid, 0.0, values)
+    days = np.trunc(values)
+    seconds = days * 86400 + np.floor(np.abs(values - days) * 86400.0 + 0.5)
+    result = np.datetime64("1899-12-30T00:00:00", "s") + seconds.astype("timedelta64[s]")
+    result[invalid] = np.datetime64("NaT")
+    return result
+
+
+def ole_invalid_mask(values):
+    """
+     * Vectorized check of the OLE automation dates ole_to_datetime returns
+     * None for: not finite, or outside the range of datetime once rounded.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    invalid = ~np.isfinite(values)
+    finite = np.where(invalid, 0.0, values)
+    days = np.trunc(finite)
+    seconds = days * 86400 + np.floor(np.abs(finite - days) * 86400.0 + 0.5)
+    return invalid | (seconds < OLE_MIN_SECONDS) | (seconds > OLE_MAX_SECONDS)
+
+
+@lru_cache(maxsize=256)
+def split_date_fmt(fmt):
+    """
+     * Splits a strftime format into alternating runs of date and time
+     * directives, so the date runs can be formatted once per day and the time
+     * runs once per second of the day. Literal text stays with the run it
+     * follows. Returns (date_runs, time_runs), with date_runs[i] preceding
+     * time_runs[i], or None when the format has %c, which mixes both.
+    """
+    runs = [""]
+    for token in DATE_FMT_TOKEN.findall(fmt):
+        if token[0] == "%" and token[-1] != "%":
+            if token[-1] == "c":
+                return None
+            if (token[-1] in TIME_DIRECTIVES) != (len(runs) % 2 == 0):
+                runs.append("")
+        runs[-1] += token
+
+    return tuple(runs[0::2]), tuple(runs[1::2])
 
-    day += 693593  # Days from 1/1/1 to 12/31/1899
-    t.tm_wday = (day + 1) % 7
 
-    q = day / 146097  # 146097 days in 400 years
-    yr += 400 * q
-    day -= q * 146097
+@lru_cache(maxsize=DATE_CACHE_SIZE)
+def format_ole_seconds(fmt, seconds):
+    return (OLE_EPOCH + timedelta(seconds=seconds)).strftime(fmt)
 
-    q = day / 36524  # 36524 days in 100 years
-    if q > 3:
-        q = 3
-    yr += 100 * q
-    day -= q * 36524
 
-    q = day / 1461  # 1461 days in 4 years
-    yr += 4 * q
-    day -= q * 1461
+@lru_cache(maxsize=DATE_CACHE_SIZE)
+def format_ole_runs(runs, seconds):
+    dt = OLE_EPOCH + timedelta(seconds=seconds)
+    return tuple(dt.strftime(run) for run in runs)
 
-    q = day / 365  # 365 days in 1 year
-    if q > 3:
-        q = 3
-    yr += q
-    day -= q * 365
 
-    cal = leap_cal if (yr % 4 == 0 and (yr % 100 != 0 or yr % 400 == 0)) else noleap_cal
+def format_seconds(fmt, seconds):
+    # strftime of OLE_EPOCH + seconds, memoized per day and per second of the day
+    runs = split_date_fmt(fmt)
+    if runs is None:
+        return format_ole_seconds(fmt, seconds)
 
-    for t.tm_mon in range(12):
-        if day < cal[t.tm_mon + 1]:
-            break
+    date_runs, time_runs = runs
+    time_of_day = seconds % 86400
+    dates = format_ole_runs(date_runs, seconds - time_of_day)
+    if not time_runs:
+        return dates[0]
 
-    t.tm_year = yr - 1900
-    t.tm_mday = day - cal[t.tm_mon] + 1
-    t.tm_yday = day
-    t.tm_isdst = -1
+    times = format_ole_runs(time_runs, time_of_day)
+    if len(dates) == 1:
+        return dates[0] + times[0]
 
-    return t
+    pieces = [None] * (len(dates) + len(times))
+    pieces[0::2] = dates
+    pieces[1::2] = times
+    return "".join(pieces)
+
+
+def format_ole_date(fmt, td):
+    """
+     * Formats an OLE automation date with strftime. The date part of the
+     * format is memoized per distinct day and the time part per distinct
+     * second of the day (see split_date_fmt).
+    """
+    if not math.isfinite(td):
+        return ""
+
+    try:
+        return format_seconds(fmt, ole_to_seconds(td))
+    except OverflowError:
+        return ""
+
+
+def single_to_string(value):
+    # Shortest repr of an MDB_FLOAT value that reads back as the same 32 bit float
+    if value != value or value in (float("inf"), float("-inf")):
+        return repr(value)
+
+    for digits in range(6, 10):
+        text = repr(float(f"{value:.{digits}g}"))
+        if SINGLE.unpack(SINGLE.pack(float(text)))[0] == value:
+            return text
+
+    return repr(value)
+
+
+def format_datetime(fmt, value):
+    # strftime of a datetime at whole seconds, memoized like format_ole_date
+    return format_seconds(fmt, (value - OLE_EPOCH) // timedelta(seconds=1))
+
+
+def date_to_string(fmt, buf, start):
+    return format_ole_date(fmt, get_double(buf, start))
 
 
 def is_relational_op(x):
@@ -295,3 +470,13 @@ def like_cmp(s, r):
 
 def ilike_cmp(s, r):
     return like_cmp(s.upper(), r.upper())
+
+
+UNSAFE_FILE_CHARS = re.compile(r'[<>:"/\\|?*\x00-\x1f]')
+
+
+def safe_file_name(name):
+    # Object name usable as a file name component: path separators and
+    # characters invalid on Windows are replaced with '_'
+    name = UNSAFE_FILE_CHARS.sub("_", name).rstrip(". ")
+    return name if name not in ("", ".", "..") else "_"